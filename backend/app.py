@@ -1,24 +1,39 @@
-from flask import Flask, request, json, has_app_context
+from flask import Flask, request, json, has_request_context
 import os
 import subprocess
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import yaml
 from datetime import datetime, timezone, timedelta
 import time
 from zoneinfo import ZoneInfo
 import re
 import threading
-import pty
 from flask_cors import CORS
 from threading import Lock
 import uuid
+import shutil
 import github_checks_helper as ghChecks
-from models import database, Execution
-import matplotlib.pyplot as plt
+from models import database, Execution, StageCache, StageRun, LogLine
+from build_queue import BuildQueue
+import log_store
+import log_search
+import log_records
+from error_classifier import classify_failure, UNKNOWN_ERROR
+from build_state import BuildStateRegistry
+from log_emitter import LogEmitter, build_room
+from log_ring import LogRing
+from check_reporter import CheckReporter
+import docker_cache
+import stage_scheduler
+import test_shards
+import stage_cache
+from pty_session import PtySession
 import io
 import base64
 import re
 from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import tuple_, func, distinct, literal_column
 
 app = Flask(__name__)
 CORS(app, origins=["*"], supports_credentials=True)
@@ -26,14 +41,57 @@ app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql://postgres@localhost:5432/po
 database.init_app(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
 REPO_DIRECTORY = "/tmp/repos"
+MIRROR_DIRECTORY = os.path.join(REPO_DIRECTORY, ".mirrors")      # one shared bare mirror per repository
+WORKTREE_DIRECTORY = os.path.join(REPO_DIRECTORY, ".worktrees")  # one checkout per build, kept as long as its container
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", 4))
+PER_REPO_CONCURRENCY = int(os.environ.get("PER_REPO_CONCURRENCY", 1))
+PAUSE_TIMEOUT = int(os.environ.get("PAUSE_TIMEOUT", 30 * 60))   # seconds a build waits at a breakpoint before it fails
+LOG_FLUSH_BATCH_LINES = 200     # flush as soon as this many new lines are waiting...
+LOG_FLUSH_INTERVAL = 1.0        # ...or once this many seconds have passed since the last flush
+MAX_IN_MEMORY_LOG_LINES = 5000  # per live build - older lines are dropped from memory once persisted
+LOG_RING_CAPACITY = 2000        # per live build - lines a reconnecting client can catch up on without storage
+ECHO_BUILD_LOGS = os.environ.get("ECHO_BUILD_LOGS") == "1"    # also print every build's lines to the server console
+MAX_TEST_SHARDS = os.cpu_count() or 1   # test shards of one build running at once
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", 2))   # default for how many stages of one build run at once
+BUILTIN_STAGES = ("lint", "format", "build", "test")
+STAGE_RUN_STATES = {"running": "active", "passed": "success", "cached": "success", "interrupted": "failed"}   # StageRun status -> dashboard state
+DEFAULT_LOG_WINDOW = 1000      # log lines returned per ranged read...
+MAX_LOG_WINDOW = 10000         # ...and the most a client may ask for at once
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DOCKER_GC_INTERVAL = 60 * 60       # seconds between garbage-collection passes over build containers/images
+DOCKER_GC_RETENTION = timedelta(hours=24)   # finished builds keep their container and worktree this long for debug replays
+INTERRUPTED_BUILD_MAX_AGE = timedelta(hours=1)   # Pending builds older than this at startup are failed, not re-run
+CWD_REPORT = re.compile(r"\x1b\]0;(.*?)\x07")   # terminal title escape the debug shell uses to report its cwd
+RANGE_WINDOWS = {               # ?range= values the dashboard filters by
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "3h": timedelta(hours=3),
+    "12h": timedelta(hours=12),
+    "1d": timedelta(days=1),
+    "7d": timedelta(days=7),
+}
+CHART_CACHE_TTL = 60            # seconds a rendered error chart is reused for, unless a build fails sooner
 
 breakpoints_map = {}
-bash_sessions = {}
-debug_started_flags = {}
+bash_sessions = {}      # build_id -> PtySession
 collected_logs = {}
 flush_threads_started = set()
 paused_flags = {} 
-resume_locks = {}
+resume_events = {}
+mirror_locks = {}
+chart_cache = {}                # range -> (rendered_at, base64 png)
+chart_render_lock = Lock()
+build_queue = BuildQueue(PIPELINE_WORKERS, PER_REPO_CONCURRENCY)
+build_states = BuildStateRegistry()
+log_emitter = LogEmitter(socketio, interval=0.05, max_batch=100)
+log_ring = LogRing(capacity=LOG_RING_CAPACITY)    # numbered live tail that reconnecting clients replay from
+log_order_lock = Lock()
+check_reporter = CheckReporter(
+    ghChecks.create_check,
+    ghChecks.update_check,
+    notify=lambda message, build_id: log(message, tag="github", build_id=build_id)
+)
 
 
 DEBUG_ASCII_ART = """
@@ -72,7 +130,6 @@ def api_events():
         repo = event.get("repository", {})
         repo_title = repo.get("full_name")
         repo_url = repo.get("clone_url")
-        local_repo_path = os.path.join(REPO_DIRECTORY, repo_title.replace("/", "_"))
 
         # Skip builds for internal system repository
         if repo_title == "AadamYB/final-year-project":
@@ -80,6 +137,9 @@ def api_events():
             return json.dumps({"status": "ignored"}), 200
         
         build_id = generate_build_id(repo_title) # KEY AS THIS IS PASSED TO EVERYTHING
+        build_states.mark_live(build_id)
+        log_ring.start(build_id)
+        local_repo_path = get_worktree_path(build_id)
 
         now = datetime.now(timezone.utc).astimezone(ZoneInfo("Europe/London"))
         print("CHECKING Local time:", now.isoformat())
@@ -119,71 +179,15 @@ def api_events():
             log(f"Received PR#{pr_number} for branch {pr_branch} in {repo_title}.", build_id=build_id)
 
             commit_sha = pr.get("head", {}).get("sha")
-            check_run_id = send_github_check(repo_title, commit_sha, build_id=build_id)
-
-            try:
-                # First we clone the repository if it does not already exist, if so then pull changes
-                clone_or_pull(repo_url, local_repo_path, repo_title, build_id, pr_branch)
-
-                # Then checkout the PR branch
-                checkout_branch(local_repo_path, pr_branch, build_id)
-
-                # Load .ci.yml if it exists
-                ci_config = load_ci_config(local_repo_path, build_id)
-                configure_breakpoints_from_ci(ci_config, build_id)
-
-                # Conditionally execute steps
-
-                # We want to make sure that the code passes the formatting before building the project
-                if ci_config.get("lint", True):
-                    lint_project(local_repo_path, build_id)
-
-                if ci_config.get("format", True):
-                    format_project(local_repo_path, build_id)
-
-                # Trigger the buiild and testing of the project
-                if ci_config.get("build", True):
-                    build_project(local_repo_path, repo_title, build_id)
-
-                if ci_config.get("test", True):
-                    run_tests(local_repo_path, repo_title, build_id)
-
-                # If users add their own custom commands
-                for cmd in ci_config.get("run_commands", []):
-                    if isinstance(cmd, str):
-                        log(f"🏃 Running custom command: {cmd}", build_id=build_id)
-                        run_command_with_stream_output(cmd, build_id, cwd=local_repo_path, tag="custom")
-
-                # All passed
-                if check_run_id:
-                    update_github_check(repo_title, check_run_id, "success", "All stages passed ✅", build_id=build_id)
-
-                execution = Execution.query.get(build_id)
-                if execution:
-                    execution.status = "Passed"
-                    end_time = datetime.now(timezone.utc).astimezone(ZoneInfo("Europe/London"))
-                    execution.duration = end_time - execution.timestamp
-                    # execution.active_stage = None - does this get rid of the last active stage causing the default to be setup?
-                if execution and build_id in collected_logs:
-                    execution.logs = "\n".join(collected_logs[build_id])
-                    database.session.commit()
-
-            except Exception as e:
-                finalize_failed_build(
-                    build_id=build_id,
-                    repo_title=repo_title,
-                    check_run_id=check_run_id,
-                    exception=e
-                )
-
-                return json.dumps({"status": "Pipeline failed"}), 500
-
-            socketio.emit("build-finished", {
-                "build_id": build_id,
-                "status": "Passed"
-            })
-            
-            return json.dumps({"status": "PR processed"}), 200
+
+            # The pipeline itself runs on a worker so the webhook delivery returns straight away
+            position = build_queue.enqueue(
+                build_id, repo_title, run_pipeline_with_context,
+                build_id, repo_title, repo_url, local_repo_path, pr_branch, commit_sha
+            )
+            log(f"📥 Build queued at position {position}", build_id=build_id)
+
+            return json.dumps({"status": "PR queued", "build_id": build_id}), 202
 
 
     except Exception as e:
@@ -197,16 +201,18 @@ def api_events():
         return json.dumps({"error": str(e)}), 500
 
 
+@app.route("/queue-status", methods=["GET"])
+def get_queue_status():
+    return build_queue.status()
+
+
 @app.route("/executions/<build_id>", methods=["GET"])
 def get_execution(build_id):
     execution = Execution.query.get(build_id)
     if not execution:
         return {"error": "Not found"}, 404
     
-    if build_id in collected_logs:
-        execution.logs = "\n".join(collected_logs[build_id])
-        database.session.commit()
-
+    # The log itself is fetched a window at a time from /executions/<id>/logs
     return {
         "id": execution.id,
         "repo_title": execution.repo_title,
@@ -214,7 +220,6 @@ def get_execution(build_id):
         "branch": execution.branch,
         "timestamp": execution.timestamp.isoformat(),
         "status": execution.status,
-        "logs": execution.logs or "",
         "active_stage": execution.active_stage or "",
         "is_paused": execution.is_paused or False,
         "pause_stage": execution.pause_stage,
@@ -223,13 +228,49 @@ def get_execution(build_id):
         **({"duration": str(execution.duration)} if execution.duration else {}) 
     }
 
+@app.route("/executions/<build_id>/logs", methods=["GET"])
+def get_execution_logs(build_id):
+    """ A window of a build's log - ?offset=&limit= for a range, or ?tail=N for the last N lines """
+    execution = Execution.query.get(build_id)
+    if not execution:
+        return {"error": "Not found"}, 404
+
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = min(max(1, int(request.args.get("limit", DEFAULT_LOG_WINDOW))), MAX_LOG_WINDOW)
+        tail = request.args.get("tail")
+        tail = min(max(1, int(tail)), MAX_LOG_WINDOW) if tail is not None else None
+    except ValueError:
+        return {"error": "offset, limit and tail must be integers"}, 400
+
+    # Lines of a live build that haven't reached the database yet follow the persisted ones
+    pending = [log_records.format_record(record) for record in log_store.unflushed_lines(build_id, collected_logs.get(build_id, []))]
+    total = log_store.count_log_lines(execution) + len(pending)
+    if tail is not None:
+        offset, limit = max(0, total - tail), tail
+
+    persisted, lines = log_store.read_log_lines(execution, offset, limit)
+    if len(lines) < limit and pending:
+        start = max(0, offset - persisted)
+        lines += pending[start:start + limit - len(lines)]
+
+    return {"build_id": build_id, "offset": offset, "total": total, "lines": lines}
+
 @app.route("/executions", methods=["GET"])
 def get_all_executions():
     range_val = request.args.get("range")
-    query = Execution.query.order_by(Execution.timestamp.desc())
+    # Project only the listed columns so the (potentially huge) logs column is never loaded
+    query = Execution.query.with_entities(
+        Execution.id, Execution.status, Execution.repo_title, Execution.pr_name,
+        Execution.timestamp, Execution.duration
+    )
     if range_val:
         query = filter_by_range(query, range_val)
-    executions = query.all()
+
+    try:
+        executions, next_cursor = paginate_by_timestamp(query)
+    except ValueError:
+        return {"error": "Invalid cursor"}, 400
 
     data = []
     for e in executions:
@@ -243,50 +284,47 @@ def get_all_executions():
             "time": e.timestamp.strftime("%H:%M"),
             "duration": duration_str 
         })
-    return json.dumps(data)
+    return json.dumps({"items": data, "next_cursor": next_cursor})
 
 @app.route("/executions-with-stages", methods=["GET"])
 def get_all_executions_with_stage_status():
     range_val = request.args.get("range")
-    query = Execution.query.order_by(Execution.timestamp.desc())
+    query = Execution.query.with_entities(
+        Execution.id, Execution.status, Execution.pr_name, Execution.timestamp,
+        Execution.duration, Execution.active_stage
+    )
     if range_val:
         query = filter_by_range(query, range_val)
-    executions = query.all()
 
-    STAGES = ["setup", "build", "test"]
+    try:
+        executions, next_cursor = paginate_by_timestamp(query)
+    except ValueError:
+        return {"error": "Invalid cursor"}, 400
+
+    # One query for the stage runs of the whole page rather than one per build
+    stage_runs = {}
+    if executions:
+        rows = (
+            StageRun.query
+            .with_entities(StageRun.build_id, StageRun.stage, StageRun.status)
+            .filter(StageRun.build_id.in_([e.id for e in executions]))
+            .order_by(StageRun.build_id, StageRun.started_at, StageRun.id)
+        )
+        for row in rows:
+            # Only the latest run of each stage counts - a re-queued build runs its stages again
+            latest = stage_runs.setdefault(row.build_id, {})
+            latest.pop(row.stage, None)
+            latest[row.stage] = {
+                "name": row.stage.capitalize(),
+                "status": STAGE_RUN_STATES.get(row.status, row.status)
+            }
+
     data = []
 
     for e in executions:
         duration_str = str(e.duration) if e.duration else None
-        stage_status = []
-
-        logs = (e.logs or "").lower()
-        status = e.status.lower()
-        active_stage = (e.active_stage or "").lower()
-
-        current_index = STAGES.index(active_stage) if active_stage in STAGES else -1
-
-        for i, stage in enumerate(STAGES):
-            name = stage.capitalize()
-            state = "pending"
-
-            if i < current_index:
-                state = "success"
-            elif i == current_index:
-                if status == "pending":
-                    state = "active"
-                elif status == "failed":
-                    state = "failed"
-                else:
-                    state = "success"
-            elif status == "failed" and active_stage == stage:
-                state = "failed"
-            elif status == "passed":
-                state = "success"
-
-            # Only add stages that were reached or relevant
-            if state != "pending":
-                stage_status.append({"name": name, "status": state})
+        # Builds from before stage runs were recorded fall back to inferring from the active stage
+        stage_status = list(stage_runs[e.id].values()) if e.id in stage_runs else infer_stage_status(e.status, e.active_stage)
 
         data.append({
             "id": e.id,
@@ -298,34 +336,152 @@ def get_all_executions_with_stage_status():
             "stage_status": stage_status
         })
 
-    return json.dumps(data)
+    return json.dumps({"items": data, "next_cursor": next_cursor})
+
+@app.route("/stage-duration-trends", methods=["GET"])
+def get_stage_duration_trends():
+    """ p50/p95 duration of each stage per hour (ranges up to a day) or per day, plus over the whole range """
+    range_val = request.args.get("range")
+    bucket = "hour" if range_val in ("15m", "1h", "3h", "12h", "1d") else "day"
+
+    duration = func.extract("epoch", StageRun.finished_at - StageRun.started_at)
+    p50 = func.percentile_cont(0.5).within_group(duration)
+    p95 = func.percentile_cont(0.95).within_group(duration)
+    finished = [StageRun.status.in_(("passed", "failed")), StageRun.finished_at.isnot(None)]
+
+    # Inline the unit - a bound parameter would differ between SELECT and GROUP BY, which Postgres rejects
+    period = func.date_trunc(literal_column(f"'{bucket}'"), StageRun.started_at)
+    trend_query = (
+        StageRun.query
+        .with_entities(StageRun.stage, period.label("period"), p50.label("p50"), p95.label("p95"), func.count().label("runs"))
+        .filter(*finished)
+        .group_by(StageRun.stage, period)
+        .order_by(StageRun.stage, period)
+    )
+    overall_query = (
+        StageRun.query
+        .with_entities(StageRun.stage, p50.label("p50"), p95.label("p95"), func.count().label("runs"))
+        .filter(*finished)
+        .group_by(StageRun.stage)
+    )
+    if range_val:
+        trend_query = filter_by_range(trend_query, range_val, StageRun.started_at)
+        overall_query = filter_by_range(overall_query, range_val, StageRun.started_at)
+
+    stages = {
+        row.stage: {"p50": round(row.p50, 2), "p95": round(row.p95, 2), "runs": row.runs, "trend": []}
+        for row in overall_query
+    }
+    for row in trend_query:
+        stages[row.stage]["trend"].append({
+            "period": row.period.isoformat(),
+            "p50": round(row.p50, 2),
+            "p95": round(row.p95, 2),
+            "runs": row.runs
+        })
+
+    return json.dumps({"bucket": bucket, "stages": stages})
+
+@app.route("/log-search", methods=["GET"])
+def search_logs():
+    """ Searches the log lines of finished builds, newest first. mode=substring (default) matches q anywhere
+        in a line; mode=words matches lines containing every word of q. Optional repo, branch, stage,
+        level, status and range filters; paginated by the cursor returned with each page """
+
+    q = (request.args.get("q") or "").strip()
+    mode = request.args.get("mode", "substring")
+    if not q:
+        return {"error": "q is required"}, 400
+
+    query = (
+        database.session.query(
+            LogLine.id, LogLine.build_id, LogLine.line_no, LogLine.tag, LogLine.level, LogLine.message,
+            Execution.repo_title, Execution.branch, Execution.status, Execution.timestamp
+        )
+        .join(Execution, Execution.id == LogLine.build_id)
+    )
+
+    if mode == "substring":
+        # Trigram index - needs at least three characters to narrow anything down
+        if len(q) < 3:
+            return {"error": "Substring search needs at least 3 characters"}, 400
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(LogLine.message.ilike(f"%{pattern}%", escape="\\"))
+        terms = [q]
+    elif mode == "words":
+        # Same expression as ix_log_line_message_tsv so the index is used
+        document = func.to_tsvector(literal_column("'simple'"), LogLine.message)
+        query = query.filter(document.op("@@")(func.plainto_tsquery(literal_column("'simple'"), q)))
+        terms = q.split()
+    else:
+        return {"error": f"Unknown mode: {mode}"}, 400
+
+    if request.args.get("repo"):
+        query = query.filter(Execution.repo_title == request.args["repo"])
+    if request.args.get("branch"):
+        query = query.filter(Execution.branch == request.args["branch"])
+    if request.args.get("stage"):
+        query = query.filter(LogLine.tag == request.args["stage"].upper())
+    if request.args.get("level"):
+        query = query.filter(LogLine.level == request.args["level"].lower())
+    if request.args.get("status"):
+        query = query.filter(Execution.status == request.args["status"].capitalize())
+    if request.args.get("range"):
+        query = filter_by_range(query, request.args["range"])
+
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor")
+    if cursor:
+        if not cursor.isdigit():
+            return {"error": "Invalid cursor"}, 400
+        query = query.filter(LogLine.id < int(cursor))
+
+    # Line ids grow as builds finish, so descending id is newest build first
+    rows = query.order_by(LogLine.id.desc()).limit(limit + 1).all()
+    next_cursor = str(rows[limit - 1].id) if len(rows) > limit else None
+
+    items = [{
+        "build_id": row.build_id,
+        "repo_title": row.repo_title,
+        "branch": row.branch,
+        "status": row.status,
+        "timestamp": row.timestamp.isoformat(),
+        "line_no": row.line_no,
+        "tag": row.tag,
+        "level": row.level,
+        "snippet": log_search.snippet(row.message, terms)
+    } for row in rows[:limit]]
+
+    return json.dumps({"items": items, "next_cursor": next_cursor})
 
 @app.route("/dashboard-metrics", methods=["GET"])
 def get_dashboard_metrics():
     range_val = request.args.get("range")
-    query = Execution.query
+    # All of the metrics come back from a single aggregate query rather than walking every row in Python
+    query = database.session.query(
+        func.count(Execution.id).label("total_builds"),
+        func.count(Execution.id).filter(Execution.status == "Failed").label("failed_builds"),
+        func.count(Execution.id).filter(Execution.status == "Passed").label("passed_builds"),
+        func.count(Execution.id).filter(Execution.status == "Pending").label("pending_builds"),
+        func.avg(Execution.duration).label("avg_duration"),
+        func.count(distinct(Execution.pr_name)).label("pull_requests"),
+    )
     if range_val:
         query = filter_by_range(query, range_val)
-    executions = query.all()
-
-    total_builds = len(executions)
-    failed_builds = [e for e in executions if e.status.lower() == "failed"]
-    passed_builds = [e for e in executions if e.status.lower() == "passed"]
-    pending_builds = [e for e in executions if e.status.lower() == "pending"]
+    totals = query.one()
 
-    num_failed = len(failed_builds)
-    num_passed = len(passed_builds)
-    num_pending = len(pending_builds)
+    total_builds = totals.total_builds
+    num_failed = totals.failed_builds
+    num_passed = totals.passed_builds
+    num_pending = totals.pending_builds
 
     failure_rate = (num_failed / total_builds) * 100 if total_builds else 0
 
-    avg_duration_seconds = sum(
-        e.duration.total_seconds() for e in executions if e.duration
-    ) / len([e for e in executions if e.duration]) if executions else 0
-
+    avg_duration_seconds = totals.avg_duration.total_seconds() if totals.avg_duration else 0
     avg_duration_minutes = round(avg_duration_seconds / 60)
 
-    pull_requests = len(set(e.pr_name for e in executions if e.pr_name))
+    pull_requests = totals.pull_requests
     releases = 0   # TODO: dynamically compute this when we have logic that works on the deploymemt - post submission work
 
     return {
@@ -342,113 +498,85 @@ def get_dashboard_metrics():
 @app.route("/dashboard-error-chart", methods=["GET"])
 def error_type_chart():
     range_val = request.args.get("range")
-    query = Execution.query.filter(Execution.status == "Failed")
+    if range_val not in RANGE_WINDOWS:
+        range_val = None    # Unfiltered, like filter_by_range - and one cache entry however many unknown ranges arrive
+    as_json = request.args.get("format") == "json"
+
+    # Rendering is the expensive part, so serve a recently rendered PNG for this range if there is one
+    if not as_json:
+        cached = chart_cache.get(range_val)
+        if cached and time.monotonic() - cached[0] < CHART_CACHE_TTL:
+            return {"image": cached[1]}
+
+    # Categories are classified once when a build fails, so this is just a GROUP BY
+    category = func.coalesce(Execution.error_category, UNKNOWN_ERROR)
+    query = database.session.query(category, func.count(Execution.id)).filter(Execution.status == "Failed")
     if range_val:
         query = filter_by_range(query, range_val)
-    executions = query.all()
-    error_counter = Counter()
-
-    for e in executions:
-        logs = e.logs or ""
-        lines = logs.splitlines()
-
-        found_error = None
-
-        for line in lines:
-            if "❌" not in line and "ERROR" not in line.upper():
-                continue
+    error_counter = Counter(dict(query.group_by(category).all()))
 
-            lower = line.lower()
-
-            if "undefined-variable" in lower or "undefined variable" in lower:
-                found_error = "Undefined Variable"
-            elif "pylint" in lower or "your code has been rated at" in lower:
-                found_error = "Lint Error"
-            elif "would reformat" in lower or "black" in lower:
-                found_error = "Format Error"
-            elif "assert" in lower and "==" in lower:
-                found_error = "Assertion Error"
-            elif "traceback" in lower or "exception:" in lower:
-                found_error = "Runtime Error"
-            elif "exit code" in lower or re.search(r"exit code \d+", lower):
-                found_error = "Subprocess Error"
-            elif "syntaxerror" in lower:
-                found_error = "Syntax Error"
-            elif "test" in lower and ("failed" in lower or "failure" in lower):
-                found_error = "Test Failure"
-
-            if found_error:
-                break  # stop after first match
-
-        if not found_error:
-            found_error = "Unknown Error"
-
-        error_counter[found_error] += 1
+    if as_json:
+        return {"counts": dict(error_counter)}   # Lets the frontend draw the chart itself
 
     if not error_counter:
         error_counter["No Errors Detected"] = 0
 
-    fig, ax = plt.subplots()
-    ax.bar(error_counter.keys(), error_counter.values())
-    ax.set_title("Common Pipeline Errors")
-    ax.set_ylabel("Occurrences")
-    ax.set_xlabel("Error Type")
-
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-
-    img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-    buf.close()
+    img_base64 = render_error_chart(error_counter)
+    chart_cache[range_val] = (time.monotonic(), img_base64)
 
     return {"image": img_base64}
 
 @app.route("/pipeline-config/<repo_name>", methods=["GET"])
 def get_pipeline_config(repo_name):
     branch = request.args.get("branch", "main")  # fallback to 'main' if not provided - but it should always be provided as we save it to the db?
-    repo_path = os.path.join(REPO_DIRECTORY, repo_name)
+    mirror_path = get_mirror_path(repo_name)
 
     # Make sure the repo exists
-    if not os.path.exists(repo_path):
+    if not os.path.exists(mirror_path):
         return {"error": "Repo not found"}, 404
 
     try:
-        # Checkout the correct branch
-        subprocess.run(["git", "-C", repo_path, "fetch", "origin"], check=True)
-        subprocess.run(["git", "-C", repo_path, "checkout", branch], check=True)
-        subprocess.run(["git", "-C", repo_path, "reset", "--hard", f"origin/{branch}"], check=True)
+        # Update just this branch in the mirror
+        with get_mirror_lock(repo_name):
+            subprocess.run(["git", "-C", mirror_path, "fetch", "origin", f"+refs/heads/{branch}:refs/heads/{branch}"], check=True)
     except subprocess.CalledProcessError as e:
         return {"error": f"Failed to checkout branch: {branch}"}, 500
 
-    # Now check if .ci.yml exists
-    ci_path = os.path.join(repo_path, ".ci.yml")
-    if not os.path.exists(ci_path):
+    # Now check if .ci.yml exists - read straight out of the mirror, no checkout needed
+    result = subprocess.run(
+        ["git", "-C", mirror_path, "show", f"refs/heads/{branch}:.ci.yml"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
         return {"error": ".ci.yml not found"}, 404
 
-    with open(ci_path, "r") as f:
-        content = f.read()
-    return {"content": content}
+    return {"content": result.stdout}
 
 @app.route("/pipeline-config/<repo_name>", methods=["POST"])
 def save_pipeline_config(repo_name):
     data = request.json
     yaml_content = data.get("content")
+    branch = data.get("branch", "main")
 
     if not yaml_content:
         return {"error": "No content provided"}, 400
 
-    local_repo_path = os.path.join(REPO_DIRECTORY, repo_name)
-    ci_file_path = os.path.join(local_repo_path, ".ci.yml")
-
-    os.makedirs(local_repo_path, exist_ok=True)
+    mirror_path = get_mirror_path(repo_name)
+    if not os.path.exists(mirror_path):
+        return {"error": "Repo not found"}, 404
 
-    with open(ci_file_path, "w") as file:
-        file.write(yaml_content)
+    # Commit from a throwaway worktree of the mirror so we never touch a running build's checkout
+    local_repo_path = os.path.join(WORKTREE_DIRECTORY, f"config-{repo_name}-{uuid.uuid4().hex[:8]}")
+    ci_file_path = os.path.join(local_repo_path, ".ci.yml")
 
     try:
-        current_branch = subprocess.check_output(["git", "-C", local_repo_path, "rev-parse", "--abbrev-ref", "HEAD"],text=True).strip()
+        with get_mirror_lock(repo_name):
+            subprocess.check_output(["git", "-C", mirror_path, "fetch", "origin", f"+refs/heads/{branch}:refs/heads/{branch}"], stderr=subprocess.STDOUT)
+            subprocess.check_output(["git", "-C", mirror_path, "worktree", "add", "--detach", local_repo_path, f"refs/heads/{branch}"], stderr=subprocess.STDOUT)
+
+        with open(ci_file_path, "w") as file:
+            file.write(yaml_content)
 
         subprocess.check_output(["git", "-C", local_repo_path, "add", ".ci.yml"])
 
@@ -457,96 +585,99 @@ def save_pipeline_config(repo_name):
             return {"status": "no changes"}  # No changes to commit
 
         subprocess.check_output(["git", "-C", local_repo_path, "commit", "-m", "🔧 Update .ci.yml via pipeline configurator"])
-        subprocess.check_output(["git", "-C", local_repo_path, "push", "origin", current_branch])
+        subprocess.check_output(["git", "-C", local_repo_path, "push", "origin", f"HEAD:refs/heads/{branch}"], stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
         return {"error": f"Git push failed: {e.output.decode()}"}, 500
+    finally:
+        remove_worktree(repo_name, local_repo_path)
 
     return {"status": "success"}
 
 @socketio.on('connect')
 def handle_connect():
+    # Kept deliberately cheap - build state is only sent once a client subscribes to a build (join-build)
     log("🛜 WebSocket client connected ✅")
 
-    executions = Execution.query.all()
-    for execution in executions:
-        if execution.breakpoints:
-            breakpoints_map[execution.id] = execution.breakpoints
-            socketio.emit("pause-configured", {"breakpoints": execution.breakpoints, "build_id": execution.id}, to=request.sid)
-    
-        if execution.is_paused and execution.pause_stage and execution.pause_type:
-            if not paused_flags.get(execution.id):
-                paused_flags[execution.id] = True
-                log(f"🔁 Detected paused state for {execution.id} - resuming...", tag="debug", build_id=execution.id)
-                threading.Thread(target=lambda: resume_pipeline_with_context(execution.id), daemon=True).start()
+
+@socketio.on('join-build')
+def handle_join_build(data):
+    build_id = data.get('build_id')
+    if not build_id:
+        return
+    after_seq = data.get('after_seq')
+    if isinstance(after_seq, int):
+        # Reconnecting client - join and replay under the log lock, so every line after after_seq
+        # reaches it exactly once from the replay or the room (repeats are dropped by seq client-side)
+        with log_order_lock:
+            join_room(build_room(build_id))
+            first_seq, lines, complete = log_ring.since(build_id, after_seq)
+            emit("log-replay", {"build_id": build_id, "first_seq": first_seq, "logs": lines, "complete": complete})
+    else:
+        join_room(build_room(build_id))
+
+    # Send this client the breakpoints for just the build it is following
+    breakpoints = breakpoints_map.get(build_id)
+    if breakpoints is None:
+        execution = Execution.query.get(build_id)
+        breakpoints = execution.breakpoints if execution else None
+    if breakpoints:
+        emit("pause-configured", {"breakpoints": breakpoints, "build_id": build_id})
+
+@socketio.on('leave-build')
+def handle_leave_build(data):
+    build_id = data.get('build_id')
+    if not build_id:
+        return
+    leave_room(build_room(build_id))
 
 @socketio.on('start-debug')
 def start_debug_session(data):
     repo = data.get("repo")
     build_id = data.get("build_id")
+    # Internal callers (a pipeline hitting a breakpoint) have no client to attach yet
+    sid = request.sid if has_request_context() else None
 
     session = bash_sessions.get(build_id)
-    if session and session["process"].poll() is not None:
+    if session and not session.is_alive():
         log(f"♻️ Cleaning up dead session for {build_id}", tag="debug", build_id=build_id)
         bash_sessions.pop(build_id, None)
-        debug_started_flags.pop(build_id, None)
+        session = None
 
-    if debug_started_flags.get(build_id):
+    if session:
         log(f"🔁 Re-attaching debug session for {build_id}", tag="debug", build_id=build_id)
-        threading.Thread(target=listen_to_bash, args=(build_id, repo), daemon=True).start()
-        return
-
-    debug_started_flags[build_id] = True
-
-    execution = Execution.query.get(build_id)
-    if execution and execution.status in {"Passed", "Failed"}:
-        log(f"🕰 Replaying debug session for old build: {build_id}", tag="debug", build_id=build_id)
-    elif not paused_flags.get(build_id, False):
-        log("⛔️ Ignoring debug start: not paused, not replay, and no active session", tag="debug", build_id=build_id)
-        return
-
-    log(f"🐞 STARTING LIVE DEBUGGING SESSION 🪲 for {repo}", tag="debug", build_id=build_id)
-
-    container_name = f"{build_id.lower()}-container"
-    log(f"🪛 Using container: {container_name}", tag="debug", build_id=build_id)
-
-    process = subprocess.Popen(
-        ["docker", "exec", "-i", container_name, "bash"],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
+    else:
+        execution = Execution.query.get(build_id)
+        if execution and execution.status in {"Passed", "Failed"}:
+            log(f"🕰 Replaying debug session for old build: {build_id}", tag="debug", build_id=build_id)
+        elif not paused_flags.get(build_id, False):
+            log("⛔️ Ignoring debug start: not paused, not replay, and no active session", tag="debug", build_id=build_id)
+            return
 
-    bash_sessions[build_id] = {
-        "process": process,
-        "stdin": process.stdin,
-        "stdout": process.stdout,
-        "cwd": "~",
-        "lock": Lock()
-    }
+        log(f"🐞 STARTING LIVE DEBUGGING SESSION 🪲 for {repo}", tag="debug", build_id=build_id)
+        session = open_debug_session(build_id, repo)
 
+    if sid:
+        emit("console-output", {"output": DEBUG_ASCII_ART})
+        session.attach(sid)
     socketio.emit("debug-session-started", {"build_id": build_id})
-    threading.Thread(target=listen_to_bash, args=(build_id, repo), daemon=True).start()
 
 @socketio.on("stop-debug")
 def stop_debug(data):
     build_id = data.get("build_id")
-    session = bash_sessions.get(build_id)
+    session = bash_sessions.pop(build_id, None)
     if session:
         try:
             log(f"🛑 Terminating debug session for {build_id}", tag="debug", build_id=build_id)
-            session["process"].terminate()
+            session.close()
         except Exception as e:
             log(f"⚠️ Warning! Could not terminate session: {e}", tag="debug", build_id=build_id)
-        bash_sessions.pop(build_id, None)
 
 @socketio.on('update-breakpoints')
 def handle_update_breakpoints(data):
     build_id = data.get('build_id')
     breakpoints = data.get('breakpoints')
 
-    expected_stages = {"setup", "build", "test"}
+    expected_stages = {"setup", "build", "test"} | set(breakpoints_map.get(build_id, {}))
     expected_keys = {"before", "after"}
 
     if not isinstance(breakpoints, dict):
@@ -562,8 +693,9 @@ def handle_update_breakpoints(data):
                 log(f"❌ ERROR! Invalid breakpoint type for {stage}.{key}", build_id=build_id)
                 return
 
-    # Save updated breakpoints
-    breakpoints_map[build_id] = breakpoints
+    # Save updated breakpoints - only a live build's pipeline reads them from memory
+    if build_states.is_live(build_id):
+        breakpoints_map[build_id] = breakpoints
     log(f"✅ Breakpoints updated to: {breakpoints}", tag="debug", build_id=build_id)
 
     execution = Execution.query.get(build_id)
@@ -587,44 +719,26 @@ def handle_console_command(data):
         emit('console-output', {'output': '❌ ERROR: Missing command or repo title'})
         return
 
-    container_name = re.sub(r'[^a-zA-Z0-9_\-]', '', build_id).lower() + "-container"
-    docker_command = f'docker exec -i {container_name} /bin/bash -c "{command}"'
-
-    socketio.emit('console-output', {'output': f"📟 Executing: {command}"})
+    session = bash_sessions.get(build_id)
+    if session is None or not session.is_alive():
+        start_debug_session({"repo": repo_title, "build_id": build_id})
+        session = bash_sessions.get(build_id)
+        if session is None:
+            emit('console-output', {'output': '⛔️ Could not start a debug session for this build.'})
+            return
 
+    # The output comes back to this client only, streamed by the session as the command produces it
+    session.attach(request.sid)
     try:
-        process = subprocess.Popen(
-            docker_command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        # Emit standard output
-        for line in iter(process.stdout.readline, ''):
-            if line.strip():
-                socketio.emit('console-output', {'output': line.strip()})
-
-        # Emit standard error
-        for err_line in iter(process.stderr.readline, ''):
-            if err_line.strip():
-                socketio.emit('console-output', {'output': f"❌ {err_line.strip()}"})
-
-        process.stdout.close()
-        process.stderr.close()
-        process.wait()
-
-        if process.returncode == 0:
-            socketio.emit('console-output', {'output': '✅ Command finished successfully'})
-        else:
-            socketio.emit('console-output', {'output': f"❌ Command exited with code {process.returncode}"})
-    except Exception as e:
-        socketio.emit('console-output', {'output': f"❌ Exception: {str(e)}"})
+        session.write(command + "\n")
+    except OSError as e:
+        emit('console-output', {'output': f"❌ Exception: {str(e)}"})
 
 @socketio.on('pause')
 def handle_pause(data):
     build_id = data.get('build_id')
+    if not build_states.is_live(build_id):
+        return      # Finished builds have nothing left to pause
     paused_flags[build_id] = True
     log("⏸️ Pause signal received from frontend! Pausing pipeline...", tag="debug", build_id=build_id)
 
@@ -645,82 +759,166 @@ def handle_resume(data=None):
 
     paused_flags.pop(build_id, None)
     log(f"🟢 Resume signal received! Continuing pipeline...", tag="debug", build_id=build_id)
-    threading.Thread(target=lambda: resume_pipeline_with_context(build_id), daemon=True).start()
+    # Wakes the pipeline thread blocked in pause_execution - it carries on from where it stopped
+    if build_states.is_live(build_id):
+        get_resume_event(build_id).set()
 
 @socketio.on('disconnect')
 def handle_disconnect():
     log("🛜 WebSocket client disconnected ❌")
-    for build_id, session in bash_sessions.items():
-        try:
-            session["process"].terminate()
-        except Exception:
-            pass
-    bash_sessions.clear()
+    # Sessions outlive the browser tab - the shell keeps its state until stop-debug or the build goes away
+    for session in list(bash_sessions.values()):
+        session.detach(request.sid)
 
 # ---------------------------------------------------------------------------------------------
 # ------------------------------------ Utility Functions --------------------------------------
 # ---------------------------------------------------------------------------------------------
 
-def log(message, tag=None, build_id=None):
-    """ Utility function that prints and emits the string message with a timestamp """
-    timestamp = datetime.now(timezone.utc).astimezone(ZoneInfo("Europe/London")).strftime("%Y-%m-%d %H:%M:%S")
-    formatted_msg = f"[{timestamp}] {'[{}] '.format(tag.upper()) if tag else ''}{message}"
-
-    print(formatted_msg)
-    socketio.emit('log', {'log': formatted_msg, 'build_id': build_id})
-
-    if not build_id or not has_app_context():
+def log(message, tag=None, build_id=None, stream="system", level=None):
+    """ Records a log line as (ts, build_id, stage, stream, level, msg). Nothing is formatted here - a
+        live build's lines go into its columns and out to clients as compact entries, and only become
+        text when they are stored or shown. level defaults to one inferred from the message's markers
+        (❌, ⚠️, ✅). A multi-line message becomes one line per record, all at the message's level, so a
+        line's seq is always its index in the stored log. """
+    ts = time.time()
+    level = level or log_records.infer_level(message)
+    lines = message.split("\n")
+
+    # Server messages always reach the console - build lines only on request, they are stored anyway
+    if not build_id or ECHO_BUILD_LOGS:
+        for line in lines:
+            print(log_records.format_line(ts, tag, line))
+    if not build_id:
         return
 
-    # Don't log to DB for replayed or finalized builds
-    execution = Execution.query.get(build_id)
-    if execution and execution.status != "Pending":
-        return  # Skip logging for passed/failed builds to avoid overwriting
-
-    if build_id not in collected_logs:
-        collected_logs[build_id] = []
+    # Don't log to DB for replayed or finalized builds - only live builds collect lines
+    if not build_states.is_live(build_id):
+        for line in lines:
+            log_emitter.push(build_id, log_records.to_wire(ts, tag, stream, level, line))   # Batched and sent only to clients following this build
+        return
 
-    collected_logs[build_id].append(formatted_msg)
+    # Numbering, collecting and queueing happen together so all three see lines in the same order
+    with log_order_lock:
+        columns = collected_logs.get(build_id)
+        if columns is None:
+            columns = collected_logs[build_id] = log_records.LogColumns(build_id)
+        for line in lines:
+            entry = log_records.to_wire(ts, tag, stream, level, line)
+            seq = log_ring.append(build_id, entry)
+            columns.append(ts, tag, stream, level, line)
+            log_emitter.push(build_id, entry, seq)
 
     if build_id not in flush_threads_started:
         flush_threads_started.add(build_id)
         threading.Thread(target=periodically_flush_logs, args=(build_id,), daemon=True).start()
 
 
-def clone_or_pull(repo_url, local_repo_path, repo_title, build_id, branch):
-    """ Clones a GitHub repository to a local directory or
-        Pulls latest changes from the repository """
-    
-    socketio.emit('active-stage-update', {'stage': 'setup'})
-    update_active_stage(build_id, "setup")
-    pause_execution('setup', 'before', build_id, repo_title)   # Can optionally pause a pileline before executing command
-
-    if not os.path.exists(local_repo_path):
-        log(f"🔄 Cloning {repo_url}")
-        cmd = f"git clone {repo_url} {local_repo_path}"
-        run_command_with_stream_output(cmd, build_id, tag="clone")
-    else:
-        log(f"🔁 Pulling latest changes in {local_repo_path}")
-        cmd = (
-            f"git -C {local_repo_path} fetch origin {branch} && "
-            f"git -C {local_repo_path} reset --hard origin/{branch}"
+def run_pipeline_with_context(build_id, repo_title, repo_url, local_repo_path, pr_branch, commit_sha):
+    """ Runs a queued pipeline on a worker thread inside an application context. The worktree is left
+        in place - the build's container mounts it at /app for debug replays, and the docker garbage
+        collector removes both together """
+
+    with app.app_context():
+        run_pipeline(build_id, repo_title, repo_url, local_repo_path, pr_branch, commit_sha)
+
+def run_pipeline(build_id, repo_title, repo_url, local_repo_path, pr_branch, commit_sha):
+    """ Runs every stage of the pipeline for a queued build and records the outcome """
+    log("🏁 Worker picked up build", build_id=build_id)
+    check_run_id = send_github_check(repo_title, commit_sha, build_id=build_id)
+
+    try:
+        socketio.emit('active-stage-update', {'stage': 'setup'})
+        update_active_stage(build_id, "setup")
+        # Pauses sit outside stage_run, as for every other stage, so time spent paused isn't setup time
+        pause_execution('setup', 'before', build_id, repo_title)   # Can optionally pause a pileline before executing command
+
+        with stage_run(build_id, "setup"):
+            # First we clone the repository if it does not already exist, if so then pull changes
+            clone_or_pull(repo_url, local_repo_path, repo_title, build_id, pr_branch)
+
+            # Then checkout the PR branch
+            checkout_branch(local_repo_path, pr_branch, build_id, repo_title)
+
+        pause_execution('setup', 'after', build_id, repo_title)
+
+        # Load .ci.yml if it exists
+        ci_config = load_ci_config(local_repo_path, build_id)
+        stages = build_stage_graph(ci_config)
+        configure_breakpoints_from_ci(ci_config, stages, build_id)
+
+        # Built-in stages - any other stage in the graph runs its own `run` commands
+        runners = {
+            "lint": lambda: lint_project(local_repo_path, build_id),
+            "format": lambda: format_project(local_repo_path, build_id),
+            "build": lambda: build_project(local_repo_path, repo_title, build_id),
+            "test": lambda: run_tests(local_repo_path, repo_title, build_id, ci_config["test_shards"]),
+        }
+        cache_keys = stage_cache_keys(stages, local_repo_path, build_id) if ci_config["cache_results"] else None
+        results = run_stages(stages, runners, ci_config["max_parallel_stages"], local_repo_path, repo_title, build_id, cache_keys)
+        cached_stages = [name for name, result in results.items() if result["status"] == "cached"]
+
+        # All passed
+        if check_run_id:
+            summary = "All stages passed ✅"
+            if cached_stages:
+                summary += f"\n\n♻️ Skipped with cached results (inputs unchanged since a passing build): {', '.join(cached_stages)}"
+            update_github_check(repo_title, check_run_id, "success", summary, build_id=build_id)
+
+        execution = Execution.query.get(build_id)
+        if execution:
+            execution.status = "Passed"
+            end_time = datetime.now(timezone.utc).astimezone(ZoneInfo("Europe/London"))
+            execution.duration = end_time - execution.timestamp
+            # execution.active_stage = None - does this get rid of the last active stage causing the default to be setup?
+            database.session.commit()
+        finish_build(build_id)
+
+    except Exception as e:
+        finalize_failed_build(
+            build_id=build_id,
+            repo_title=repo_title,
+            check_run_id=check_run_id,
+            exception=e
         )
-        run_command_with_stream_output(cmd, build_id, tag="pull")
-    
-    pause_execution('setup', 'after', build_id, repo_title)
+        return
 
+    socketio.emit("build-finished", {
+        "build_id": build_id,
+        "status": "Passed"
+    })
 
 
-def checkout_branch(local_repo_path, branch_name, build_id):
-    """ Checkouts the correct branch for the Pull Request """
+def clone_or_pull(repo_url, local_repo_path, repo_title, build_id, branch):
+    """ Updates the repository's shared bare mirror with just the PR branch,
+        creating the mirror with a one-off clone the first time """
+
+    mirror_path = get_mirror_path(repo_title)
+    with get_mirror_lock(repo_title):
+        if not os.path.exists(mirror_path):
+            log(f"🔄 Cloning {repo_url} into mirror cache", build_id=build_id)
+            cmd = f"git clone --bare {repo_url} {mirror_path}"
+            run_command_with_stream_output(cmd, build_id, tag="clone")
+        else:
+            log(f"🔁 Fetching {branch} into mirror cache {mirror_path}", build_id=build_id)
+            # Narrow refspec - only the PR branch is transferred, not every ref in the repo
+            cmd = f"git -C {mirror_path} fetch origin +refs/heads/{branch}:refs/heads/{branch}"
+            run_command_with_stream_output(cmd, build_id, tag="pull")
+
+
+
+def checkout_branch(local_repo_path, branch_name, build_id, repo_title):
+    """ Checks out the Pull Request branch into a worktree of its own for this build, so builds
+        of the same repository can run side by side without trampling each other """
     log(f"🌿 Checking out branch: {branch_name}", build_id=build_id)
-    # fetch latest branches
-    cmd_fetch = f"git -C {local_repo_path} fetch origin"
-    run_command_with_stream_output(cmd_fetch, build_id, tag="checkout")
 
-    # checkout to the correct branch
-    cmd_checkout = f"git -C {local_repo_path} checkout {branch_name}"
-    run_command_with_stream_output(cmd_checkout, build_id, tag="checkout")
+    mirror_path = get_mirror_path(repo_title)
+    with get_mirror_lock(repo_title):
+        # Forget worktrees whose directories have already gone
+        run_command_with_stream_output(f"git -C {mirror_path} worktree prune", build_id, tag="checkout")
+
+        # Detached, so fetching the branch into the mirror is never blocked by a build using it
+        cmd_checkout = f"git -C {mirror_path} worktree add --force --detach {local_repo_path} refs/heads/{branch_name}"
+        run_command_with_stream_output(cmd_checkout, build_id, tag="checkout")
 
 
 def lint_project(local_repo_path, build_id):
@@ -761,7 +959,7 @@ def lint_project(local_repo_path, build_id):
         line = line.strip()
         if line:
             output_lines.append(line)
-            log(line, tag="lint", build_id=build_id)
+            log(line, tag="lint", build_id=build_id, stream="stdout")
 
     process.wait()
 
@@ -782,7 +980,7 @@ def lint_project(local_repo_path, build_id):
         log("⚠️ WARNING! Pylint score not found in output.", tag="lint", build_id=build_id)
 
     if process.returncode != 0:
-        raise Exception(f"❌ ERROR! Linting failed.\n\n{full_output}")
+        raise CommandFailed(f"❌ ERROR! Linting failed.\n\n{full_output}", process.returncode)
 
 
 def format_project(local_repo_path, build_id):
@@ -799,55 +997,84 @@ def format_project(local_repo_path, build_id):
 def build_project(local_repo_path, repo_title, build_id):
     """ Builds the project inside a Docker container """
 
-    socketio.emit('active-stage-update', {'stage': 'build'})
-    update_active_stage(build_id, "build")
-    pause_execution('build', 'before', build_id, repo_title)   # Can choose to pause pipeline if we want - according to user
-
     log(f"🏗️ Building project in {local_repo_path}", tag="build", build_id=build_id)
 
     dockerfile_path = os.path.join(local_repo_path, "Dockerfile")
     if not os.path.exists(dockerfile_path):
         raise Exception(f"❌ ERROR! No Dockerfile found at {dockerfile_path}")
 
-    # Create docker-(image and/or container) name based on repo
-    repo_title = os.path.basename(local_repo_path)
-    image_name = f"{build_id.lower()}-image"
-    container_name = f"{build_id.lower()}-container"
+    # Create docker-(image and/or container) name based on the build
+    image_name = docker_cache.build_image_name(build_id)
+    container_name = docker_cache.build_container_name(build_id)
 
-    # Build docker image
-    run_command_with_stream_output(f"docker build -t {image_name} {local_repo_path}", build_id, tag="build")
+    # Build docker image - layers come from the repo's cache image when the Dockerfile and dependencies are unchanged
+    cache_image = docker_cache.cache_image_name(repo_title, docker_cache.dependency_hash(local_repo_path))
+    log(f"🗃️ Using layer cache {cache_image}", tag="build", build_id=build_id)
+    run_command_with_stream_output(docker_cache.build_command(local_repo_path, build_id, repo_title, cache_image), build_id, tag="build")
 
-    # SKIP THIS ENTIRELY - as the container doesn't exist yet - we can build on this later [TODO]
-    # Stop and remove old container if exists
-    # run_command_with_stream_output(f"docker rm -f {container_name} || true", build_id, tag="build")
+    # Stop and remove old container if exists - a build re-queued after a restart keeps its build_id
+    run_command_with_stream_output(f"docker rm -f {container_name} || true", build_id, tag="build")
 
-    # Start container in background
+    # Start container in background - labelled so the garbage collector can find it later
     run_command_with_stream_output(
-        f"docker run -d --name {container_name} -v {local_repo_path}:/app {image_name} tail -f /dev/null",
+        f"docker run -d --name {container_name} --label {docker_cache.BUILD_LABEL}={build_id} "
+        f"-v {local_repo_path}:/app {image_name} tail -f /dev/null",
         build_id,
         tag="build"
     )
 
     log(f"🚀 Container {container_name} running for debugging!", tag="build", build_id=build_id)
 
-    pause_execution('build', 'after', build_id, repo_title)
-
-
-def run_tests(local_repo_path, repo_title, build_id):
-    """ Runs the test scripts for the user project also stream output """
 
-    socketio.emit('active-stage-update', {'stage': 'test'})
-    update_active_stage(build_id, "test")
-    pause_execution('test', 'before', build_id, repo_title) 
+def run_tests(local_repo_path, repo_title, build_id, shard_count=1):
+    """ Runs the test scripts for the user project also stream output - split across
+        `shard_count` containers of the build image when the project opts into sharding """
 
     log(f"🧪 Running tests in {local_repo_path}", tag="test", build_id=build_id)
 
-    image_name = f"{build_id.lower()}-image"
-    cmd = (
-        f"docker run --rm -v {local_repo_path}:/app "
-        f"-w /app {image_name} pytest tests --tb=short"
+    # Every shard is its own container, all started at once - no more of them than the host has cores
+    if shard_count > MAX_TEST_SHARDS:
+        log(f"⚠️ Capping test_shards at {MAX_TEST_SHARDS} (the CPU count), {shard_count} were asked for", tag="test", build_id=build_id)
+        shard_count = MAX_TEST_SHARDS
+
+    image_name = docker_cache.build_image_name(build_id)
+    test_files = test_shards.discover_test_files(local_repo_path) if shard_count > 1 else []
+    shards = test_shards.split_into_shards(
+        test_files, shard_count, test_shards.file_size_weights(local_repo_path, test_files)
     )
 
+    if len(shards) > 1:
+        returncode, full_output = run_test_shards(shards, local_repo_path, image_name, build_id)
+    else:
+        cmd = (
+            f"docker run --rm -v {local_repo_path}:/app "
+            f"-w /app {image_name} pytest tests --tb=short"
+        )
+        returncode, full_output = run_test_command(cmd, local_repo_path, build_id)
+
+    # Post-test checks
+    if "collected 0 items" in full_output:
+        # Check if __init__.py exists in tests directory
+        test_init = os.path.join(local_repo_path, "tests", "__init__.py")
+        if not os.path.exists(test_init):
+            log("⚠️ WARNING: No tests were discovered.", tag="test", build_id=build_id)
+            log("📂 Make sure your `tests/` directory has an `__init__.py` file.", tag="test", build_id=build_id)
+        else:
+            log(
+                "⚠️ CAUTION! No tests discovered, but `__init__.py` exists. "
+                "Check that your test files start with `test_` and contain test functions.",
+                tag="test",
+                build_id=build_id
+            )
+
+    if returncode != 0:
+        raise CommandFailed(f"❌ Test stage failed failed!\n{full_output}", returncode)
+
+    log("✅ All tests passed!", tag="test", build_id=build_id)
+
+def run_test_command(cmd, local_repo_path, build_id, prefix=""):
+    """ Runs one pytest container, streaming its output under the test tag - returns (exit code, output) """
+
     log(f"🚀 Running command: {cmd}", tag="test", build_id=build_id)
 
     process = subprocess.Popen(
@@ -867,33 +1094,41 @@ def run_tests(local_repo_path, repo_title, build_id):
         line = line.strip()
         if line:
             output_lines.append(line)
-            log(line, tag="test", build_id=build_id)
+            log(f"{prefix}{line}", tag="test", build_id=build_id, stream="stdout")
 
     process.wait()
 
-    full_output = "\n".join(output_lines)
+    return process.returncode, "\n".join(output_lines)
 
-    # Post-test checks
-    if "collected 0 items" in full_output:
-        # Check if __init__.py exists in tests directory
-        test_init = os.path.join(local_repo_path, "tests", "__init__.py")
-        if not os.path.exists(test_init):
-            log("⚠️ WARNING: No tests were discovered.", tag="test", build_id=build_id)
-            log("📂 Make sure your `tests/` directory has an `__init__.py` file.", tag="test", build_id=build_id)
-        else:
-            log(
-                "⚠️ CAUTION! No tests discovered, but `__init__.py` exists. "
-                "Check that your test files start with `test_` and contain test functions.",
-                tag="test",
-                build_id=build_id
-            )
+def run_test_shards(shards, local_repo_path, image_name, build_id):
+    """ Runs each shard of test files in its own container at the same time and merges the
+        results - the stage fails if any shard fails """
 
-    if process.returncode != 0:
-        raise Exception(f"❌ Test stage failed failed!\n{full_output}")
+    log(f"🧩 Splitting {sum(len(shard) for shard in shards)} test files across {len(shards)} shards", tag="test", build_id=build_id)
+    results = [None] * len(shards)
 
-    log("✅ All tests passed!", tag="test", build_id=build_id)
+    def run_shard(index, test_files):
+        cmd = (
+            f"docker run --rm -v {local_repo_path}:/app "
+            f"-w /app {image_name} pytest {' '.join(test_files)} --tb=short"
+        )
+        try:
+            results[index] = run_test_command(cmd, local_repo_path, build_id, prefix=f"[shard {index + 1}/{len(shards)}] ")
+        except Exception as e:
+            results[index] = (1, f"Shard {index + 1} could not run: {e}")
+
+    threads = [threading.Thread(target=run_shard, args=(i, shard), daemon=True) for i, shard in enumerate(shards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    failed = [i + 1 for i, (returncode, _) in enumerate(results) if returncode != 0]
+    for i, (returncode, _) in enumerate(results):
+        log(f"{'❌' if returncode else '✅'} Shard {i + 1}/{len(shards)} exited with code {returncode}", tag="test", build_id=build_id)
 
-    pause_execution('test', 'after', build_id, repo_title) 
+    full_output = "\n".join(output for _, output in results)
+    return (results[failed[0] - 1][0] if failed else 0), full_output
 
 def load_ci_config(local_repo_path, build_id):
     """ This is for the  configuration page where users can update their ci pipline steps """
@@ -907,6 +1142,11 @@ def load_ci_config(local_repo_path, build_id):
             "build": True,
             "test": True,
             "run_commands": [],
+            "parallel_checks": False,
+            "stages": None,
+            "max_parallel_stages": STAGE_WORKERS,
+            "test_shards": 1,
+            "cache_results": False,
             "pause_before_clone": False,
             "pause_after_clone": False,
             "pause_before_build": False,
@@ -926,6 +1166,11 @@ def load_ci_config(local_repo_path, build_id):
                 "build": config.get("build", True),
                 "test": config.get("test", True),
                 "run_commands": config.get("run_commands", []),
+                "parallel_checks": config.get("parallel_checks", False),
+                "stages": config.get("stages"),
+                "max_parallel_stages": config_count(config, "max_parallel_stages", STAGE_WORKERS),
+                "test_shards": config_count(config, "test_shards", 1),
+                "cache_results": config.get("cache_results", False),
                 "pause_before_clone": config.get("pause_before_clone", False),
                 "pause_after_clone": config.get("pause_after_clone", False),
                 "pause_before_build": config.get("pause_before_build", False),
@@ -938,13 +1183,202 @@ def load_ci_config(local_repo_path, build_id):
         log(f"❌ ERROR! Failed to load .ci.yml: {e}", build_id=build_id)
         raise
 
-def configure_breakpoints_from_ci(ci_config, build_id):
+def config_count(config, key, default):
+    """ A positive whole number from .ci.yml (quoted numbers allowed) - raises ValueError naming the key otherwise """
+    value = config.get(key, default)
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' in .ci.yml must be a whole number, got {value!r}") from None
+
+def build_stage_graph(ci_config):
+    """ Maps each stage name to {"needs", "run", "breakpoints"} - taken from the `stages` section of
+        .ci.yml, or built from the lint/format/build/test switches when there isn't one.
+        "run" is None for a built-in stage and a list of commands otherwise """
+
+    declared = ci_config.get("stages")
+    if not declared:
+        return default_stage_graph(ci_config)
+
+    if not isinstance(declared, dict):
+        raise Exception("❌ ERROR! `stages` in .ci.yml must map each stage name to its settings")
+
+    stages = {}
+    for name, settings in declared.items():
+        settings = settings or {}
+        needs = settings.get("needs", [])
+        run = settings.get("run")
+
+        if run is None and name not in BUILTIN_STAGES:
+            raise Exception(f"❌ ERROR! Stage '{name}' has no `run` commands and is not one of {', '.join(BUILTIN_STAGES)}")
+
+        breakpoints = None
+        if "pause_before" in settings or "pause_after" in settings:
+            breakpoints = {"before": bool(settings.get("pause_before")), "after": bool(settings.get("pause_after"))}
+
+        stages[name] = {
+            "needs": [needs] if isinstance(needs, str) else list(needs),
+            "run": [run] if isinstance(run, str) else run,
+            "breakpoints": breakpoints,
+        }
+
+    try:
+        stage_scheduler.topological_order({name: stage["needs"] for name, stage in stages.items()})
+    except ValueError as e:
+        raise Exception(f"❌ ERROR! Invalid stages in .ci.yml: {e}")
+
+    return stages
+
+def default_stage_graph(ci_config):
+    """ The classic lint -> format -> build -> test -> custom commands chain, with lint and
+        format side by side when parallel_checks is on """
+
+    stages = {}
+    if ci_config.get("lint", True):
+        stages["lint"] = {"needs": [], "run": None, "breakpoints": None}
+
+    if ci_config.get("format", True):
+        needs = [] if ci_config.get("parallel_checks", False) else [name for name in stages]
+        stages["format"] = {"needs": needs, "run": None, "breakpoints": None}
+
+    checks = list(stages)
+    if ci_config.get("build", True):
+        stages["build"] = {"needs": checks, "run": None, "breakpoints": None}
+
+    if ci_config.get("test", True):
+        stages["test"] = {"needs": ["build"] if "build" in stages else checks, "run": None, "breakpoints": None}
+
+    # If users add their own custom commands they run once everything else has passed
+    commands = [cmd for cmd in ci_config.get("run_commands") or [] if isinstance(cmd, str)]
+    if commands:
+        stages["custom"] = {"needs": list(stages), "run": commands, "breakpoints": None}
+
+    return stages
+
+def run_stages(stages, runners, max_workers, local_repo_path, repo_title, build_id, cache_keys=None):
+    """ Runs the stage graph, independent stages side by side - raises the error of the first
+        failed stage once every stage that could still run has finished, otherwise returns the
+        per-stage results. Stages in `cache_keys` (name -> input hash) are skipped when a passing
+        build of the repo already had the same inputs """
+
+    cache_keys = cache_keys or {}
+
+    def run_stage(name):
+        # Each stage runs on its own thread, so it needs its own application context for the database
+        with app.app_context():
+            input_hash = cache_keys.get(name)
+            if input_hash:
+                cached = StageCache.query.get((repo_title, name, input_hash))
+                if cached:
+                    log(f"♻️ Skipping {name} - inputs unchanged since passing build {cached.build_id}", tag=name, build_id=build_id)
+                    record_stage_run(build_id, name, "cached")
+                    return "cached"
+
+            socketio.emit('active-stage-update', {'stage': name})
+            update_active_stage(build_id, name)
+            pause_execution(name, 'before', build_id, repo_title)   # Can optionally pause before any stage
+
+            commands = stages[name]["run"]
+            with stage_run(build_id, name):
+                if commands is None:
+                    runners[name]()
+                else:
+                    for cmd in commands:
+                        log(f"🏃 Running custom command: {cmd}", tag=name, build_id=build_id)
+                        run_command_with_stream_output(cmd, build_id, cwd=local_repo_path, tag=name)
+
+            if input_hash:
+                # merge - two builds with the same inputs may both get here
+                database.session.merge(StageCache(
+                    repo_title=repo_title, stage=name, input_hash=input_hash,
+                    build_id=build_id, created_at=datetime.now(timezone.utc)
+                ))
+                database.session.commit()
+
+            pause_execution(name, 'after', build_id, repo_title)
+
+    def skip_stage(name):
+        log(f"⏭️ Skipping {name} - a stage it needs did not pass", tag=name, build_id=build_id)
+        record_stage_run(build_id, name, "skipped")
+
+    plan = ", ".join(f"{name} <- [{', '.join(stage['needs'])}]" for name, stage in stages.items())
+    log(f"🗺️ Stage plan: {plan}", build_id=build_id)
+    needs = {name: stage["needs"] for name, stage in stages.items()}
+    results = stage_scheduler.run_stage_graph(needs, run_stage, max_workers=max_workers, on_skip=skip_stage)
+    log_stage_timings(build_id, results)
+
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    if failed:
+        update_active_stage(build_id, failed[0])    # So the stage views show where the build broke
+        raise results[failed[0]]["error"]
+    return results
+
+def stage_cache_keys(stages, local_repo_path, build_id):
+    """ Input hashes of the built-in stages that can be cached - custom commands may have side effects, so always run """
+
+    try:
+        blobs = stage_cache.tracked_blob_hashes(local_repo_path)
+    except Exception as e:
+        log(f"⚠️ Could not hash the checkout, running every stage: {e}", tag="cache", build_id=build_id)
+        return {}
+
+    cache_keys = {}
+    for name, stage in stages.items():
+        input_hash = stage_cache.stage_input_hash(name, blobs) if stage["run"] is None else None
+        if input_hash:
+            cache_keys[name] = input_hash
+    log(f"🔑 Cacheable stages: {', '.join(cache_keys) or 'none'}", tag="cache", build_id=build_id)
+    return cache_keys
+
+def log_stage_timings(build_id, results):
+    """ Logs how each stage went - the timings themselves are stored as StageRun rows """
+
+    for name, result in results.items():
+        if result["duration"] is not None:
+            log(f"⏱️ {name}: {result['status']} in {result['duration']:.2f}s", tag="timing", build_id=build_id)
+        else:
+            log(f"⏱️ {name}: {result['status']}", tag="timing", build_id=build_id)
+
+@contextmanager
+def stage_run(build_id, stage):
+    """ Records a StageRun for the block - running while it executes, then passed or failed
+        with the exit code of the command that failed, when there is one """
+
+    run = StageRun(build_id=build_id, stage=stage, started_at=datetime.now(timezone.utc), status="running")
+    database.session.add(run)
+    database.session.commit()
+
+    try:
+        yield run
+    except Exception as e:
+        run.status = "failed"
+        run.exit_code = getattr(e, "exit_code", None)
+        run.finished_at = datetime.now(timezone.utc)
+        database.session.commit()
+        raise
+
+    run.status = "passed"
+    run.exit_code = 0
+    run.finished_at = datetime.now(timezone.utc)
+    database.session.commit()
+
+def record_stage_run(build_id, stage, status):
+    """ Records a stage that finished without running - skipped or served from the cache """
+    now = datetime.now(timezone.utc)
+    database.session.add(StageRun(build_id=build_id, stage=stage, started_at=now, finished_at=now, status=status))
+    database.session.commit()
+
+def configure_breakpoints_from_ci(ci_config, stages, build_id):
     """ Reads the data from the ci_config variable and maps that to the breakpoint dictionary """
     breakpoints = {
         "setup": {"before": ci_config.get("pause_before_clone", False), "after": ci_config.get("pause_after_clone", False)},
         "build": {"before": ci_config.get("pause_before_build", False), "after": ci_config.get("pause_after_build", False)},
         "test": {"before": ci_config.get("pause_before_test", False), "after": ci_config.get("pause_after_test", False)},
     }
+    # Stages declared in .ci.yml can carry their own pause_before/pause_after
+    for name, stage in stages.items():
+        if stage["breakpoints"]:
+            breakpoints[name] = stage["breakpoints"]
     breakpoints_map[build_id] = breakpoints
 
     execution = Execution.query.get(build_id)
@@ -953,8 +1387,15 @@ def configure_breakpoints_from_ci(ci_config, build_id):
         database.session.commit()
 
     log(f"Breakpoints configured: {breakpoints}", tag="debug", build_id=build_id)
-    socketio.emit("pause-configured", {"breakpoints": breakpoints})
+    socketio.emit("pause-configured", {"breakpoints": breakpoints, "build_id": build_id}, to=build_room(build_id))
+
 
+class CommandFailed(Exception):
+    """ A stage command exited non-zero - carries the exit code through to the stage's StageRun """
+
+    def __init__(self, message, exit_code):
+        super().__init__(message)
+        self.exit_code = exit_code
 
 def run_command_with_stream_output(cmd, build_id, cwd=None, tag=None):
     """ Runs a shell command and streams output over WebSocket """
@@ -981,13 +1422,13 @@ def run_command_with_stream_output(cmd, build_id, cwd=None, tag=None):
         line = line.strip()
         if line:
             output_lines.append(line)
-            log(line, tag=tag, build_id=build_id)
+            log(line, tag=tag, build_id=build_id, stream="stdout")
 
     process.wait()
 
     if process.returncode != 0:
         log(f"⛔️ ERROR during [{tag}] stage. ❌ Exit Code: {process.returncode}", tag="error", build_id=build_id)
-        raise Exception(f"Stage [{tag}] failed with exit code {process.returncode}")
+        raise CommandFailed(f"Stage [{tag}] failed with exit code {process.returncode}", process.returncode)
     
 def update_active_stage(build_id, stage):
     """ Updates the active stage of a pipeline execution in the database - better 
@@ -998,93 +1439,38 @@ def update_active_stage(build_id, stage):
         execution.active_stage = stage
         database.session.commit()
 
-def get_resume_lock(build_id):
-    """ Retrieves or creates a thread-safe lock object for a given build_id """
-
-    if build_id not in resume_locks:
-        resume_locks[build_id] = Lock()
-    return resume_locks[build_id]
+def get_mirror_path(repo_title):
+    """ Location of the shared bare mirror for a repository ("owner/repo" or "owner_repo") """
+    return os.path.join(MIRROR_DIRECTORY, repo_title.replace("/", "_") + ".git")
 
-def resume_pipeline_with_context(build_id):
-    """ Resumes the pipeline within an application context for a 
-        specific build - prevents Run-time error(not catastrophic) """
+def get_worktree_path(build_id):
+    """ Location of the checkout used by a single build """
+    return os.path.join(WORKTREE_DIRECTORY, build_id)
 
-    with get_resume_lock(build_id):
-        with app.app_context():
-            resume_pipeline(build_id)
+def get_mirror_lock(repo_title):
+    """ Retrieves or creates the lock that serialises git operations on a repository's mirror """
 
-def resume_pipeline(build_id):
-    """ Handles resuming a pipeline execution from paused state based on the stage and timing(when-[bef/aft]) """
+    key = repo_title.replace("/", "_")
+    if key not in mirror_locks:
+        mirror_locks[key] = Lock()
+    return mirror_locks[key]
 
-    execution = Execution.query.get(build_id)
-    if not execution:
-        log(f"❌ Cannot resume: build {build_id} not found.")
-        return
-
-    local_repo_path = os.path.join(REPO_DIRECTORY, execution.repo_title.replace("/", "_"))
-    stage = execution.pause_stage
-    when = execution.pause_type
-    repo_title = execution.repo_title
-
-    if not stage or not when:
-        log("⚠️ Cannot resume: pause_stage or pause_type is None", tag="resume", build_id=build_id)
-        return
-
-    log(f"▶️ Resuming pipeline from {stage.upper()} ({when.upper()})...", tag="resume", build_id=build_id)
-
-    try:
-        ci_config = load_ci_config(local_repo_path, build_id)
-
-        if stage == "setup":
-            if when == "before":
-                # TODO: May want to store pr_branch in Execution if needed here - for now the placeholder will do though
-                clone_or_pull(repo_title, local_repo_path, repo_title, build_id, "<branch>")
-                checkout_branch(local_repo_path, "<branch>", build_id)
-                if ci_config.get("lint", True):
-                    lint_project(local_repo_path, build_id)
-                if ci_config.get("format", True):
-                    format_project(local_repo_path, build_id)
-                build_project(local_repo_path, repo_title, build_id)
-                run_tests(local_repo_path, repo_title, build_id)
-            elif when == "after":
-                if ci_config.get("lint", True):
-                    lint_project(local_repo_path, build_id)
-                if ci_config.get("format", True):
-                    format_project(local_repo_path, build_id)
-                build_project(local_repo_path, repo_title, build_id)
-                run_tests(local_repo_path, repo_title, build_id)
-
-        elif stage == "build":
-            if when == "before":
-                build_project(local_repo_path, repo_title, build_id)
-                run_tests(local_repo_path, repo_title, build_id)
-            elif when == "after":
-                run_tests(local_repo_path, repo_title, build_id)
-
-        elif stage == "test":
-            if when == "before":
-                run_tests(local_repo_path, repo_title, build_id)
-            elif when == "after":
-                log("✅ All pipeline stages already completed.", tag="resume", build_id=build_id)
-                return
-            
-        else:
-            log(f"⚠️ Cannot resume from unknown stage '{stage}'", tag="resume", build_id=build_id)
-            return
+def remove_worktree(repo_title, worktree_path):
+    """ Removes a build's worktree once it is finished with - the mirror is kept for the next build """
 
-        execution.is_paused = False
-        execution.pause_stage = None
-        execution.pause_type = None
-        execution.status = "Passed"
-        database.session.commit()
+    mirror_path = get_mirror_path(repo_title)
+    with get_mirror_lock(repo_title):
+        if os.path.exists(mirror_path):
+            subprocess.run(["git", "-C", mirror_path, "worktree", "remove", "--force", worktree_path], capture_output=True)
+    if os.path.exists(worktree_path):
+        shutil.rmtree(worktree_path, ignore_errors=True)
 
-        socketio.emit("build-finished", {
-            "build_id": build_id,
-            "status": "Passed"
-        })
+def get_resume_event(build_id):
+    """ Retrieves or creates the event a paused pipeline thread waits on until it is resumed """
 
-    except Exception as e:
-        finalize_failed_build(build_id, repo_title, None, e)
+    if build_id not in resume_events:
+        resume_events[build_id] = threading.Event()
+    return resume_events[build_id]
 
 def pause_execution(stage, when, build_id, repo_title):
     """ Pauses the pipeline at the specified stage and time ('before' or 'after'), 
@@ -1095,6 +1481,8 @@ def pause_execution(stage, when, build_id, repo_title):
         return
 
     log(f"🚨 Pausing at {stage.upper()} ({when.upper()}) ... Waiting for resume command!", tag="debug", build_id=build_id)
+    resume_event = get_resume_event(build_id)
+    resume_event.clear()    # Ignore any resume that arrived before this pause
     paused_flags[build_id] = True
 
     execution = Execution.query.get(build_id)
@@ -1108,8 +1496,26 @@ def pause_execution(stage, when, build_id, repo_title):
     socketio.emit('allow-breakpoint-edit', {"stage": stage.upper(), "when": when.upper()})
     log("🔓 User can now edit future breakpoints during pause!", tag="debug", build_id=build_id)
 
-    while paused_flags.get(build_id, False):
-        time.sleep(0.5)
+    # Block without polling - handle_resume sets the event and this thread continues straight away.
+    # The build keeps its worker and repo slot meanwhile, so a breakpoint nobody resumes fails it in the end.
+    build_queue.mark_paused(build_id, True)
+    try:
+        resumed = resume_event.wait(timeout=PAUSE_TIMEOUT)
+    finally:
+        build_queue.mark_paused(build_id, False)
+
+    execution = Execution.query.get(build_id)
+    if execution:
+        execution.is_paused = False
+        execution.pause_stage = None
+        execution.pause_type = None
+        database.session.commit()
+
+    if not resumed:
+        paused_flags.pop(build_id, None)
+        raise Exception(f"❌ ERROR! Paused at {stage.upper()} ({when.upper()}) for {PAUSE_TIMEOUT}s without a resume - giving up the build")
+
+    log(f"▶️ Resuming pipeline from {stage.upper()} ({when.upper()})...", tag="resume", build_id=build_id)
 
 
 def ensure_debug_session_started(build_id, repo):
@@ -1119,7 +1525,7 @@ def ensure_debug_session_started(build_id, repo):
         return
     
     session = bash_sessions.get(build_id)
-    if session is None or session["process"].poll() is not None:
+    if session is None or not session.is_alive():
         start_debug_session({"repo": repo, "build_id": build_id})
 
 def generate_build_id(repo_title: str) -> str:
@@ -1131,47 +1537,45 @@ def generate_build_id(repo_title: str) -> str:
     return f"{safe_repo}-{timestamp}-{unique_id}"
 
 def send_github_check(repo_title, commit_sha, check_name="CI Pipeline", build_id=None):
-    """ Creates a new GitHub check run and returns the check_run_id """
-    try:
-        check = ghChecks.create_check(
-            repo_title,
-            commit_sha,
-            check_name,
-            status="in_progress",
-            output={
-                "title": "CI Pipeline Running...",
-                "summary": f"View real-time logs at [Debug UI](http://localhost:3000/debug/{build_id})",
-            },
-        )
-        return check["id"]
-    except Exception as e:
-        log(f"❌ Failed to create GitHub Check Run: {e}", build_id=build_id)
+    """ Queues a new GitHub check run on the background reporter and returns the handle
+        used to update it - the pipeline never waits on the GitHub API """
+    if not commit_sha:
+        log("⚠️ No commit SHA for this build - skipping GitHub Check Run", build_id=build_id)
         return None
 
+    return check_reporter.create(
+        build_id,
+        repo_title,
+        commit_sha,
+        check_name,
+        status="in_progress",
+        output={
+            "title": "CI Pipeline Running...",
+            "summary": f"View real-time logs at [Debug UI](http://localhost:3000/debug/{build_id})",
+        },
+    )
+
 
 def update_github_check(repo_title, check_run_id, conclusion="success", summary="", build_id=None):
-    """ Updates an existing GitHub check run with final status """
+    """ Queues the final status of an existing GitHub check run on the background reporter """
     if not check_run_id:
         return
 
-    try:
-        full_summary = summary
-        if build_id:
-            full_summary += f"\n\n🔗 [View debug logs](http://localhost:3000/debug/{build_id})"
-
-        ghChecks.update_check(
-            repo_title,
-            check_run_id,
-            status="completed",
-            conclusion=conclusion,
-            output={
-                "title": f"Build {'Passed ✅' if conclusion == 'success' else 'Failed ❌'}",
-                "summary": full_summary
-            }
-        )
-        log(f"📬 Check run updated: {conclusion.upper()}", tag="FINISHED", build_id=build_id)
-    except Exception as e:
-        log(f"⚠️ Failed to update check run: {e}", build_id=build_id)
+    full_summary = summary
+    if build_id:
+        full_summary += f"\n\n🔗 [View debug logs](http://localhost:3000/debug/{build_id})"
+
+    check_reporter.update(
+        check_run_id,
+        repo_title,
+        status="completed",
+        conclusion=conclusion,
+        output={
+            "title": f"Build {'Passed ✅' if conclusion == 'success' else 'Failed ❌'}",
+            "summary": full_summary
+        }
+    )
+    log(f"📬 Check run update queued: {conclusion.upper()}", tag="FINISHED", build_id=build_id)
 
 def finalize_failed_build(build_id, repo_title, check_run_id, exception):
     """ Helper that updates the execution in the database when the pipeline execution fails """
@@ -1186,75 +1590,336 @@ def finalize_failed_build(build_id, repo_title, check_run_id, exception):
             execution.status = "Failed"
             end_time = datetime.now(timezone.utc).astimezone(ZoneInfo("Europe/London"))
             execution.duration = end_time - execution.timestamp
-        if execution and build_id in collected_logs:
-            execution.logs = "\n".join(collected_logs[build_id])
             database.session.commit()
+        finish_build(build_id)
+
+        # Classified from the stored log once every line is in it - the in-memory lines may be only the
+        # tail of a long build, and this way the category matches what backfill_error_categories.py finds
+        if execution:
+            execution.error_category = classify_failure(log_store.read_execution_logs(execution).splitlines())
+            database.session.commit()
+            chart_cache.clear()     # A new failure changes the error chart
 
         socketio.emit("build-finished", {
             "build_id": build_id,
             "status": "Failed"
         })
 
-def listen_to_bash(build_id, repo):
-    """ Streams real-time output from the container's bash session during a debug session.
-        and formats each line with a mock shell prompt and emits it via WebSocket. """
-    
-    session = bash_sessions.get(build_id)
-    if not session:
-        return
+def open_debug_session(build_id, repo):
+    """ Starts the persistent shell in the build's container that every console command for the build reuses """
 
-    process = session["process"]
-    stdout = session["stdout"]
-    ascii_shown = False
+    container_name = docker_cache.build_container_name(build_id)
+    log(f"🪛 Using container: {container_name}", tag="debug", build_id=build_id)
 
-    # TODO: Current Working Directory needs to be shown in the prompt - not working!!!!!
-    for line in stdout:
-        if line:
-            user = repo.split("/")[-1]
-            ip = "35.177.242.182"
-            cwd = session["cwd"]
-            prompt = f"\n{user}@{ip} {cwd} ~$ "
+    user = repo.split("/")[-1] if repo else "user"
+
+    def send(sid, text, ack):
+        # The shell reports its cwd after each command - show it in the client's prompt
+        cwds = CWD_REPORT.findall(text)
+        if cwds:
+            socketio.emit("prompt-update", {"prompt": f"{user}@35.177.242.182:{cwds[-1]}$ "}, to=sid)
+            text = CWD_REPORT.sub("", text)
+
+        if text.strip():
+            socketio.emit("console-output", {"output": text.rstrip("\n")}, to=sid, callback=ack)
+        else:
+            ack()
+
+    def on_exit():
+        if bash_sessions.get(build_id) is session:
+            bash_sessions.pop(build_id, None)
+        log(f"‼️ Debug session exited for {build_id}", tag="debug", build_id=build_id)
+
+    session = PtySession(container_name, send, on_exit=on_exit)
+    session.start()
+    bash_sessions[build_id] = session
+    return session
+
+def render_error_chart(error_counter):
+    """ Draws the error counts as a bar chart and returns it as a base64 PNG. matplotlib is imported
+        on first use (with the non-interactive Agg backend) so it doesn't slow down every startup """
 
-            output = (DEBUG_ASCII_ART + "\n" + line) if not ascii_shown else line
-            ascii_shown = True
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-            socketio.emit("console-output", {"output": output + prompt})
+    # pyplot keeps global state, so only draw one chart at a time
+    with chart_render_lock:
+        fig, ax = plt.subplots()
+        ax.bar(error_counter.keys(), error_counter.values())
+        ax.set_title("Common Pipeline Errors")
+        ax.set_ylabel("Occurrences")
+        ax.set_xlabel("Error Type")
 
-    log(f"‼️ Debug session exited for {build_id}", tag="debug", build_id=build_id)
+        buf = io.BytesIO()
+        plt.tight_layout()
+        plt.savefig(buf, format="png")
+        plt.close(fig)
+        buf.seek(0)
+
+        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
+        buf.close()
+
+    return img_base64
 
 def periodically_flush_logs(build_id):
-    """ Flushes collected logs to the database if new lines are added. Ensures 
-        logs are persisted and saved to database during live execution """
+    """ Appends newly collected log lines to the database as chunks, batched by size or time.
+        Ensures logs are persisted and saved to database during live execution """
     
     with app.app_context():
-        previous_log_len = 0
-        while build_id in collected_logs:
+        last_flush = time.monotonic()
+        # finish_build writes whatever is left once the build stops being live
+        while build_states.is_live(build_id):
             time.sleep(0.1)
             current_logs = collected_logs.get(build_id, [])
-            if len(current_logs) > previous_log_len:
-                execution = Execution.query.get(build_id)
-                if execution:
-                    execution.logs = "\n".join(current_logs)
-                    try:
-                        database.session.commit()
-                        previous_log_len = len(current_logs)
-                    except Exception as e:
-                        log(f"⚠️ Could not flush logs: {e}", tag="debug", build_id=build_id)
-
-def filter_by_range(query, range_val):
-    now = datetime.utcnow()
-    ranges = {
-        "15m": now - timedelta(minutes=15),
-        "1h": now - timedelta(hours=1),
-        "3h": now - timedelta(hours=3),
-        "12h": now - timedelta(hours=12),
-        "1d": now - timedelta(days=1),
-        "7d": now - timedelta(days=7),
-    }
-    if range_val in ranges:
-        return query.filter(Execution.timestamp >= ranges[range_val])
+            pending = log_store.unflushed_count(build_id, current_logs)
+            if not pending:
+                continue
+
+            if pending >= LOG_FLUSH_BATCH_LINES or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL:
+                try:
+                    log_store.append_new_lines(build_id, current_logs)
+                    last_flush = time.monotonic()
+                    # Past the cap, the oldest lines live only in the database
+                    log_store.spill_flushed_lines(build_id, current_logs, MAX_IN_MEMORY_LOG_LINES)
+                except Exception as e:
+                    log(f"⚠️ Could not flush logs: {e}", tag="debug", build_id=build_id)
+
+def finish_build(build_id):
+    """ End of a build's lifecycle - once its outcome is committed, persist the rest of its log and
+        release everything held in memory for it. Only live builds hold per-build state, so memory
+        and threads stay flat however many builds the server has run. """
+
+    build_states.mark_finished(build_id)
+    try:
+        persist_final_logs(build_id)
+    finally:
+        release_build_state(build_id)
+
+def release_build_state(build_id):
+    """ Drops a finished build's in-memory state - its flush thread notices the build is no longer live and exits """
+
+    for state in (collected_logs, breakpoints_map, paused_flags, resume_events):
+        state.pop(build_id, None)
+    flush_threads_started.discard(build_id)
+    log_store.forget(build_id)
+    log_ring.discard(build_id)
+
+def persist_final_logs(build_id):
+    """ Writes the last collected lines of a finished build, compacts its log into compressed segments
+        and indexes its lines for /log-search """
+
+    if build_id in collected_logs:
+        log_store.append_new_lines(build_id, collected_logs[build_id])
+
+    execution = Execution.query.get(build_id)
+    if execution:
+        try:
+            line_count = log_store.compact_logs(execution)
+            print(f"🗜️ Compacted {line_count} log lines for {build_id}")
+        except Exception as e:
+            # The uncompressed chunks are still there, so the log stays readable
+            print(f"⚠️ Could not compact logs for {build_id}: {e}")
+
+        try:
+            lines = log_store.read_execution_logs(execution).split("\n")
+            log_search.index_build_logs(build_id, lines, log_store.read_line_fields(execution))
+        except Exception as e:
+            # Search is a convenience - the build's log itself is already stored
+            print(f"⚠️ Could not index logs of {build_id} for search: {e}")
+
+def start_background_services():
+    """ Runs once per server process - recovers interrupted builds and starts the docker garbage collector """
+
+    recover_interrupted_builds()
+    threading.Thread(target=periodically_collect_docker_garbage, daemon=True).start()
+
+def periodically_collect_docker_garbage():
+    while True:
+        try:
+            collect_docker_garbage()
+        except Exception as e:
+            log(f"⚠️ Docker garbage collection failed: {e}", tag="gc")
+        time.sleep(DOCKER_GC_INTERVAL)
+
+def collect_docker_garbage():
+    """ Removes the containers, worktrees and per-build images of builds that finished more than
+        DOCKER_GC_RETENTION ago and every repo cache tag but the newest, then prunes dangling layers """
+
+    live_builds = build_states.live_builds()
+    cutoff = datetime.now(timezone.utc) - DOCKER_GC_RETENTION
+    removed = 0
+
+    with app.app_context():
+        kept_images = {docker_cache.build_image_name(build_id) for build_id in live_builds}
+
+        for container_name, build_id in docker_cache.list_build_containers():
+            if build_id in live_builds or is_recent_build(Execution.query.get(build_id), cutoff):
+                kept_images.add(docker_cache.build_image_name(build_id))
+                continue
+
+            docker_cache.remove_container(container_name)
+            removed += 1
+
+        # Each build's container mounts its worktree, so the two go at the same age
+        build_ids = os.listdir(WORKTREE_DIRECTORY) if os.path.isdir(WORKTREE_DIRECTORY) else []
+        for build_id in build_ids:
+            if build_id in live_builds or build_id.startswith("config-"):
+                continue    # config worktrees are removed by the request that made them
+            execution = Execution.query.get(build_id)
+            if is_recent_build(execution, cutoff):
+                continue
+
+            worktree_path = get_worktree_path(build_id)
+            if execution:
+                remove_worktree(execution.repo_title, worktree_path)
+            else:
+                shutil.rmtree(worktree_path, ignore_errors=True)
+            removed += 1
+
+    # Any per-build image that no kept container or live build needs can go
+    images = docker_cache.inspect_pipeline_images()
+    for image_name in docker_cache.list_build_images(images) - kept_images:
+        docker_cache.remove_image(image_name)
+        removed += 1
+
+    # Only the newest dependency cache of each repo is reused - older tags would keep their images forever
+    for image_name in docker_cache.list_outdated_cache_images(images):
+        docker_cache.remove_image(image_name)
+        removed += 1
+
+    docker_cache.prune_dangling_images()
+    log(f"🧹 Docker garbage collection removed {removed} stale containers/worktrees/images", tag="gc")
+
+def is_recent_build(execution, cutoff):
+    """ Whether a build is still running or finished after cutoff """
+    if not execution:
+        return False
+    finished_at = execution.timestamp + (execution.duration or timedelta())
+    return execution.status == "Pending" or finished_at > cutoff
+
+def recover_interrupted_builds():
+    """ Runs once at startup - builds still Pending in the database have lost their pipeline thread (the
+        server restarted under them). Recent ones are re-queued to run again from the start; older ones
+        are marked Failed rather than all re-running at once. Finished builds are never touched. """
+
+    cutoff = datetime.now(timezone.utc) - INTERRUPTED_BUILD_MAX_AGE
+
+    with app.app_context():
+        interrupted = Execution.query.filter(Execution.status == "Pending").all()   # covered by ix_execution_active
+
+        for execution in interrupted:
+            if build_states.is_live(execution.id):
+                continue
+
+            execution.is_paused = False
+            execution.pause_stage = None
+            execution.pause_type = None
+            build_id = execution.id
+
+            # Stages that were running when the server went down never finished - close them off, outside
+            # the duration trends, which only count passed and failed runs
+            StageRun.query.filter(StageRun.build_id == build_id, StageRun.status == "running").update(
+                {"status": "interrupted", "finished_at": datetime.now(timezone.utc)}, synchronize_session=False
+            )
+
+            if execution.timestamp < cutoff:
+                execution.status = "Failed"
+                execution.duration = None
+                database.session.commit()
+                print(f"🪦 Build {build_id} was interrupted by a server restart too long ago - marked as failed")
+                continue
+
+            database.session.commit()
+            build_states.mark_live(build_id)
+            log_ring.start(build_id, log_store.count_log_lines(execution))  # Carry on numbering after the lines already stored
+            log("🔁 Build was interrupted by a server restart - re-queuing it", tag="resume", build_id=build_id)
+
+            # The run checks out a fresh worktree - git won't add one over the directory the interrupted run left
+            worktree_path = get_worktree_path(build_id)
+            remove_worktree(execution.repo_title, worktree_path)
+
+            # We don't keep the commit SHA, so the re-run goes without a GitHub check run
+            build_queue.enqueue(
+                build_id, execution.repo_title, run_pipeline_with_context,
+                build_id, execution.repo_title, f"https://github.com/{execution.repo_title}.git",
+                worktree_path, execution.branch, None
+            )
+
+def infer_stage_status(status, active_stage):
+    """ Best guess at the stage states of a build with no StageRun rows, from how far it got """
+
+    STAGES = ["setup", "build", "test"]
+    stage_status = []
+
+    status = status.lower()
+    active_stage = (active_stage or "").lower()
+
+    current_index = STAGES.index(active_stage) if active_stage in STAGES else -1
+
+    for i, stage in enumerate(STAGES):
+        name = stage.capitalize()
+        state = "pending"
+
+        if i < current_index:
+            state = "success"
+        elif i == current_index:
+            if status == "pending":
+                state = "active"
+            elif status == "failed":
+                state = "failed"
+            else:
+                state = "success"
+        elif status == "failed" and active_stage == stage:
+            state = "failed"
+        elif status == "passed":
+            state = "success"
+
+        # Only add stages that were reached or relevant
+        if state != "pending":
+            stage_status.append({"name": name, "status": state})
+
+    return stage_status
+
+def filter_by_range(query, range_val, column=Execution.timestamp):
+    """ Keeps rows from the last RANGE_WINDOWS[range_val] - unknown ranges leave the query unfiltered """
+    if range_val in RANGE_WINDOWS:
+        return query.filter(column >= datetime.utcnow() - RANGE_WINDOWS[range_val])
     return query
 
+def paginate_by_timestamp(query):
+    """ Keyset pagination over (timestamp, id), newest first, driven by the limit/cursor request args.
+        Returns the page of rows and the cursor for the next page (None on the last page) """
+
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = query.order_by(Execution.timestamp.desc(), Execution.id.desc())
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Execution.timestamp, Execution.id) < tuple_(cursor_timestamp, cursor_id))
+
+    # Fetch one extra row to find out whether there is another page
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def encode_cursor(row):
+    """ Opaque cursor pointing just past the given row """
+    raw = f"{row.timestamp.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """ Reverses encode_cursor - raises ValueError for anything malformed """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, build_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), build_id
+    except ValueError as e:   # also covers bad base64 padding and UnicodeDecodeError
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 # ------------------------------------------------------------
 
 if __name__ == "__main__":
@@ -1271,5 +1936,7 @@ if __name__ == "__main__":
     #     print("✅ Repo removed. You can now comment out this block.")
 
 
-    os.makedirs(REPO_DIRECTORY, exist_ok=True)
+    os.makedirs(MIRROR_DIRECTORY, exist_ok=True)
+    os.makedirs(WORKTREE_DIRECTORY, exist_ok=True)
+    start_background_services()
     socketio.run(app, debug=False, host="0.0.0.0", port=5000)
@@ -0,0 +1,34 @@
+""" Classifies failed executions that finished before error categories were stored - safe to re-run """
+
+from app import app
+from models import database, Execution
+from error_classifier import classify_failure
+import log_store
+
+BATCH_SIZE = 100
+
+with app.app_context():
+    last_id = ""
+    classified = 0
+
+    # Walk the unclassified failures in id order, committing one batch at a time
+    while True:
+        batch = (
+            Execution.query
+            .filter(Execution.status == "Failed", Execution.error_category.is_(None), Execution.id > last_id)
+            .order_by(Execution.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            break
+
+        for execution in batch:
+            execution.error_category = classify_failure(log_store.read_execution_logs(execution).splitlines())
+        database.session.commit()
+
+        last_id = batch[-1].id
+        classified += len(batch)
+        print(f"🏷️ Classified {classified} executions...")
+
+    print(f"✅ Backfill complete - {classified} executions classified!")
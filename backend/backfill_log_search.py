@@ -0,0 +1,38 @@
+""" Indexes the logs of builds that finished before log search existed - safe to re-run """
+
+from app import app
+from models import database, Execution, LogLine
+import log_search
+import log_store
+
+BATCH_SIZE = 100
+
+with app.app_context():
+    last_id = ""
+    indexed = 0
+
+    # Walk the finished builds with no search rows in id order, one batch at a time
+    while True:
+        batch = (
+            Execution.query
+            .filter(
+                Execution.status.in_(("Passed", "Failed")),
+                Execution.id > last_id,
+                ~database.session.query(LogLine.id).filter(LogLine.build_id == Execution.id).exists()
+            )
+            .order_by(Execution.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            break
+
+        for execution in batch:
+            lines = log_store.read_execution_logs(execution).split("\n")
+            log_search.index_build_logs(execution.id, lines, log_store.read_line_fields(execution))
+
+        last_id = batch[-1].id
+        indexed += len(batch)
+        print(f"🔎 Indexed {indexed} executions...")
+
+    print(f"✅ Backfill complete - {indexed} executions indexed!")
@@ -0,0 +1,36 @@
+""" Compacts the logs of builds that finished before logs were compacted into segments - safe to re-run """
+
+from app import app
+from models import database, Execution, LogSegment
+import log_store
+
+BATCH_SIZE = 100
+
+with app.app_context():
+    last_id = ""
+    compacted = 0
+
+    # Walk the finished builds with no segments in id order - each build commits on its own
+    while True:
+        batch = (
+            Execution.query
+            .filter(
+                Execution.status.in_(("Passed", "Failed")),
+                Execution.id > last_id,
+                ~database.session.query(LogSegment.seq).filter(LogSegment.build_id == Execution.id).exists()
+            )
+            .order_by(Execution.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            break
+
+        for execution in batch:
+            log_store.compact_logs(execution)
+
+        last_id = batch[-1].id
+        compacted += len(batch)
+        print(f"🗜️ Compacted {compacted} executions...")
+
+    print(f"✅ Backfill complete - {compacted} executions compacted!")
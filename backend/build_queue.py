@@ -0,0 +1,120 @@
+""" Build queue - a bounded pool of pipeline workers that drains builds queued by the webhook """
+import threading
+import time
+from collections import deque
+
+
+class BuildQueue:
+    """ FIFO queue of pipeline jobs drained by a fixed number of worker threads. A job is only
+        picked up when its repository is below the per-repo concurrency limit, so one busy repo
+        can't starve the others. """
+
+    def __init__(self, worker_count=4, per_repo_limit=1, wait_sample_size=100):
+        self.worker_count = max(1, worker_count)
+        self.per_repo_limit = max(1, per_repo_limit)
+        self._pending = deque()
+        self._running = {}                                  # build_id -> job
+        self._running_per_repo = {}                         # repo_title -> count
+        self._paused = set()                                # running build_ids waiting at a breakpoint
+        self._wait_times = deque(maxlen=wait_sample_size)   # seconds jobs spent queued
+        self._condition = threading.Condition()
+        self._started = False
+
+    def start(self):
+        """ Spawns the worker threads - safe to call more than once """
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+
+        for i in range(self.worker_count):
+            threading.Thread(target=self._worker, name=f"pipeline-worker-{i}", daemon=True).start()
+
+    def enqueue(self, build_id, repo_title, target, *args):
+        """ Queues target(*args) to run on a worker and returns the job's position in the queue """
+        self.start()
+
+        job = {
+            "build_id": build_id,
+            "repo_title": repo_title,
+            "target": target,
+            "args": args,
+            "enqueued_at": time.monotonic(),
+        }
+
+        with self._condition:
+            self._pending.append(job)
+            self._condition.notify()
+            return len(self._pending)
+
+    def mark_paused(self, build_id, paused):
+        """ Records that a running build is waiting at a breakpoint - it still holds its worker and repo slot """
+        with self._condition:
+            if paused:
+                self._paused.add(build_id)
+            else:
+                self._paused.discard(build_id)
+
+    def status(self):
+        """ Snapshot of the queue depth, running jobs and how long builds wait before starting """
+        now = time.monotonic()
+
+        with self._condition:
+            repos = {}
+            for job in self._pending:
+                repos.setdefault(job["repo_title"], {"queued": 0, "running": 0, "paused": 0})["queued"] += 1
+            for repo_title, count in self._running_per_repo.items():
+                repos.setdefault(repo_title, {"queued": 0, "running": 0, "paused": 0})["running"] = count
+            for build_id in self._paused:
+                repos[self._running[build_id]["repo_title"]]["paused"] += 1
+
+            oldest_wait = now - self._pending[0]["enqueued_at"] if self._pending else 0
+            avg_wait = sum(self._wait_times) / len(self._wait_times) if self._wait_times else 0
+
+            return {
+                "workers": self.worker_count,
+                "per_repo_limit": self.per_repo_limit,
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                "queued_builds": [job["build_id"] for job in self._pending],
+                "running_builds": list(self._running),
+                "paused_builds": list(self._paused),
+                "oldest_wait_seconds": round(oldest_wait, 2),
+                "avg_wait_seconds": round(avg_wait, 2),
+                "repos": repos,
+            }
+
+    def _take_next_job(self):
+        """ Pops the oldest job whose repo has a free slot - caller must hold the condition """
+        for job in self._pending:
+            if self._running_per_repo.get(job["repo_title"], 0) < self.per_repo_limit:
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._take_next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._take_next_job()
+
+                repo_title = job["repo_title"]
+                self._running[job["build_id"]] = job
+                self._running_per_repo[repo_title] = self._running_per_repo.get(repo_title, 0) + 1
+                self._wait_times.append(time.monotonic() - job["enqueued_at"])
+
+            try:
+                job["target"](*job["args"])
+            except Exception as e:
+                print(f"❌ ERROR! Pipeline job {job['build_id']} crashed: {e}")
+            finally:
+                with self._condition:
+                    self._running.pop(job["build_id"], None)
+                    self._paused.discard(job["build_id"])
+                    self._running_per_repo[repo_title] -= 1
+                    if not self._running_per_repo[repo_title]:
+                        del self._running_per_repo[repo_title]
+                    # A repo slot has freed up, so a job that was skipped earlier may now be runnable
+                    self._condition.notify_all()
@@ -0,0 +1,26 @@
+""" In-process registry of the builds whose pipeline is still live on this server """
+from threading import Lock
+
+
+class BuildStateRegistry:
+    """ Tracks live builds in memory so hot paths like log() never need to ask the database """
+
+    def __init__(self):
+        self._live_builds = set()
+        self._lock = Lock()
+
+    def mark_live(self, build_id):
+        with self._lock:
+            self._live_builds.add(build_id)
+
+    def mark_finished(self, build_id):
+        with self._lock:
+            self._live_builds.discard(build_id)
+
+    def is_live(self, build_id):
+        # Set membership is atomic, so readers don't need the lock
+        return build_id in self._live_builds
+
+    def live_builds(self):
+        with self._lock:
+            return set(self._live_builds)
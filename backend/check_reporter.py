@@ -0,0 +1,151 @@
+""" Background GitHub check reporter - check runs are created and updated off the pipeline thread """
+import threading
+import time
+from collections import deque
+
+import requests
+
+RETRYABLE_STATUS_CODES = {403, 429, 500, 502, 503, 504}
+
+
+class CheckReporter:
+    """ Sends check run creates/updates from a single background thread, in order, so a slow or
+        rate-limited GitHub API never stalls a build. Each check is identified by a handle (the
+        build_id) until GitHub hands back its real id. Updates for a handle that are still waiting
+        to be sent are coalesced, so only the newest state is ever posted. """
+
+    def __init__(self, create_fn, update_fn, notify=print, max_attempts=5, base_delay=1.0, max_delay=60.0):
+        self.create_fn = create_fn
+        self.update_fn = update_fn
+        self.notify = notify                # notify(message, handle) - reports progress and failures
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queue = deque()               # ("create" | "update", handle)
+        self._creates = {}                  # handle -> create arguments
+        self._pending_updates = {}          # handle -> newest update arguments not yet sent
+        self._check_ids = {}                # handle -> GitHub check_run_id
+        self._condition = threading.Condition()
+        self._started = False
+
+    def start(self):
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def create(self, handle, repo_full_name, commit_sha, name, **kwargs):
+        """ Queues creation of a check run and returns the handle to update it with """
+        self.start()
+        with self._condition:
+            self._creates[handle] = (repo_full_name, commit_sha, name, kwargs)
+            self._queue.append(("create", handle))
+            self._condition.notify()
+        return handle
+
+    def update(self, handle, repo_full_name, **kwargs):
+        """ Queues an update - replaces any update for the same handle that hasn't been sent yet """
+        self.start()
+        with self._condition:
+            already_queued = handle in self._pending_updates
+            self._pending_updates[handle] = (repo_full_name, kwargs)
+            if not already_queued:
+                self._queue.append(("update", handle))
+                self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._queue)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                action, handle = self._queue.popleft()
+
+            if action == "create":
+                self._send_create(handle)
+            else:
+                self._send_update(handle)
+
+    def _send_create(self, handle):
+        with self._condition:
+            repo_full_name, commit_sha, name, kwargs = self._creates.pop(handle)
+
+        check = self._with_retries(handle, lambda: self.create_fn(repo_full_name, commit_sha, name, **kwargs))
+        if check is not None:
+            with self._condition:
+                self._check_ids[handle] = check["id"]
+
+    def _send_update(self, handle):
+        if handle not in self._pending_updates:
+            return      # Already sent along with an earlier queued update
+
+        check_run_id = self._check_ids.get(handle)
+        if check_run_id is None:
+            # The create never made it to GitHub, so there is nothing to update
+            with self._condition:
+                self._pending_updates.pop(handle, None)
+            self.notify("⚠️ Skipping check run update - the check run was never created", handle)
+            return
+
+        def send():
+            # Take the newest payload on every attempt, so a retry never resends a superseded update
+            with self._condition:
+                payload = self._pending_updates.pop(handle, None)
+            if payload is None:
+                return None     # Already sent along with an earlier queued update
+            repo_full_name, kwargs = payload
+            try:
+                return self.update_fn(repo_full_name, check_run_id, **kwargs)
+            except Exception:
+                with self._condition:
+                    self._pending_updates.setdefault(handle, payload)
+                raise
+
+        result = self._with_retries(handle, send)
+        with self._condition:
+            if result is None:
+                self._pending_updates.pop(handle, None)
+            elif result.get("status") == "completed" and handle not in self._pending_updates:
+                self._check_ids.pop(handle, None)   # Nothing else will be sent for this check
+
+    def _with_retries(self, handle, send):
+        """ Calls send() with exponential backoff, honouring GitHub's rate-limit headers - returns None if it gives up """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return send()
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRYABLE_STATUS_CODES or attempt == self.max_attempts:
+                    self.notify(f"❌ GitHub check run request failed: {e}", handle)
+                    return None
+                delay = self._retry_delay(e.response, attempt)
+            except requests.RequestException as e:
+                if attempt == self.max_attempts:
+                    self.notify(f"❌ GitHub check run request failed: {e}", handle)
+                    return None
+                delay = self._retry_delay(None, attempt)
+            except Exception as e:
+                # e.g. a missing private key - retrying won't help, but the reporter thread must survive
+                self.notify(f"❌ GitHub check run request failed: {e}", handle)
+                return None
+
+            self.notify(f"⏳ GitHub check run request failed, retrying in {delay:.0f}s (attempt {attempt}/{self.max_attempts})", handle)
+            time.sleep(delay)
+        return None
+
+    def _retry_delay(self, response, attempt):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset_at = response.headers.get("X-RateLimit-Reset")
+                if reset_at and reset_at.isdigit():
+                    return max(0.0, float(reset_at) - time.time()) + 1
+
+        return min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
@@ -1,8 +1,28 @@
-""" RAN ONCE? """
+""" RAN ONCE? - safe to re-run, it only creates the tables, columns and indexes that are missing """
 
 from app import app
 from models import database
 
 with app.app_context():
+    # The log search index uses trigram operators
+    database.session.execute(database.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    database.session.commit()
+
     database.create_all()
-    print("✅ Tables created successfully!")
\ No newline at end of file
+
+    # create_all() skips tables that already exist, so add any newer columns and indexes to them separately
+    inspector = database.inspect(database.engine)
+    for table in database.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=database.engine.dialect)
+                database.session.execute(database.text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"➕ Added column {table.name}.{column.name}")
+    database.session.commit()
+
+    for table in database.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=database.engine, checkfirst=True)
+
+    print("✅ Tables created successfully!")
@@ -0,0 +1,149 @@
+""" Docker layer caching and garbage collection for pipeline builds """
+import hashlib
+import os
+import re
+import subprocess
+
+BUILD_LABEL = "ci.build_id"
+CACHE_LABEL = "ci.cache_repo"      # repo slug whose dependency cache the image is tagged as
+
+# Files that decide the dependency layers of an image - if none of these change, the layers can be reused
+DEPENDENCY_FILES = (
+    "Dockerfile",
+    "requirements.txt",
+    "requirements-dev.txt",
+    "pyproject.toml",
+    "poetry.lock",
+    "Pipfile.lock",
+    "setup.py",
+    "setup.cfg",
+)
+
+
+def dependency_hash(local_repo_path):
+    """ Short content hash of the Dockerfile and dependency manifests in the checkout """
+    digest = hashlib.sha256()
+    for name in DEPENDENCY_FILES:
+        path = os.path.join(local_repo_path, name)
+        if os.path.exists(path):
+            digest.update(name.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def repo_slug(repo_title):
+    return re.sub(r"[^a-z0-9_.-]", "-", repo_title.lower())
+
+
+def cache_repository(slug):
+    return f"{slug}-ci-cache"
+
+
+def cache_image_name(repo_title, deps_hash):
+    """ Stable per-repo tag that later builds with the same dependencies pull their layers from """
+    return f"{cache_repository(repo_slug(repo_title))}:{deps_hash}"
+
+
+def build_image_name(build_id):
+    return f"{build_id.lower()}-image"
+
+
+def build_container_name(build_id):
+    return f"{build_id.lower()}-container"
+
+
+def build_command(local_repo_path, build_id, repo_title, cache_image):
+    """ docker build that reuses the layers of the repo's cache image and refreshes it with the result.
+        The image is labelled with its build and repo, which is how the garbage collector finds
+        per-build images and outdated cache tags. """
+    return (
+        f"DOCKER_BUILDKIT=1 docker build "
+        f"--cache-from {cache_image} --build-arg BUILDKIT_INLINE_CACHE=1 "
+        f"--label {BUILD_LABEL}={build_id} --label {CACHE_LABEL}={repo_slug(repo_title)} "
+        f"-t {build_image_name(build_id)} -t {cache_image} {local_repo_path}"
+    )
+
+
+def list_build_containers():
+    """ (container name, build_id) for every container started by a pipeline build """
+    output = subprocess.run(
+        ["docker", "ps", "-a", "--filter", f"label={BUILD_LABEL}", "--format", f'{{{{.Names}}}}\t{{{{.Label "{BUILD_LABEL}"}}}}'],
+        capture_output=True,
+        text=True
+    ).stdout
+    return [tuple(line.split("\t", 1)) for line in output.splitlines() if "\t" in line]
+
+
+def inspect_pipeline_images():
+    """ (build_id, repo slug, created, tags) for every image a pipeline build made - found by the build
+        label, so images the pipeline didn't build (e.g. project-image) are never included """
+    image_ids = subprocess.run(
+        ["docker", "images", "-q", "--no-trunc", "--filter", f"label={BUILD_LABEL}"],
+        capture_output=True,
+        text=True
+    ).stdout.split()
+    if not image_ids:
+        return []
+
+    labels = f'{{{{index .Config.Labels "{BUILD_LABEL}"}}}}\t{{{{index .Config.Labels "{CACHE_LABEL}"}}}}'
+    output = subprocess.run(
+        ["docker", "image", "inspect", "--format", f'{labels}\t{{{{.Created}}}}\t{{{{join .RepoTags " "}}}}', *set(image_ids)],
+        capture_output=True,
+        text=True
+    ).stdout
+
+    images = []
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 4:
+            build_id, slug, created, tags = fields
+            images.append((build_id, slug, created, tags.split()))
+    return images
+
+
+def list_build_images(images):
+    """ Names of the per-build images still present. A build's image is also its repo's cache tag, so
+        only the <build_id>-image tag of each is returned. """
+    names = set()
+    for build_id, _, _, tags in images:
+        image_name = build_image_name(build_id)
+        if build_id and f"{image_name}:latest" in tags:
+            names.add(image_name)
+    return names
+
+
+def list_outdated_cache_images(images):
+    """ Every repo cache tag but the newest of each repo - a dependency change leaves the previous tag
+        behind, and each one would pin a whole image """
+    cache_tags = {}     # slug -> [(created, tag)]
+    for _, slug, created, tags in images:
+        if not slug:
+            continue
+        for tag in tags:
+            if tag.startswith(cache_repository(slug) + ":"):
+                cache_tags.setdefault(slug, []).append((created, tag))
+
+    outdated = []
+    for tags in cache_tags.values():
+        outdated.extend(tag for _, tag in sorted(tags, key=lambda t: created_order(t[0]), reverse=True)[1:])
+    return outdated
+
+
+def created_order(created):
+    """ Sort key for docker's RFC 3339 `Created` times - the fraction drops trailing zeros, so the strings alone don't sort """
+    seconds, _, fraction = created.partition(".")
+    return seconds[:19], float("0." + (fraction.rstrip("Z") or "0"))
+
+
+def remove_container(container_name):
+    subprocess.run(["docker", "rm", "-f", container_name], capture_output=True)
+
+
+def remove_image(image_name):
+    """ Untags the image - the layers themselves stay while the repo's cache tag still points at them """
+    subprocess.run(["docker", "rmi", image_name], capture_output=True)
+
+
+def prune_dangling_images():
+    subprocess.run(["docker", "image", "prune", "-f"], capture_output=True)
@@ -0,0 +1,36 @@
+""" Works out why a pipeline failed from its log lines - stored once when the build finalises """
+import re
+
+UNKNOWN_ERROR = "Unknown Error"
+
+
+def is_error_line(line):
+    return "❌" in line or "ERROR" in line.upper()
+
+
+def classify_failure(lines):
+    """ Returns the error category of the first error line that matches a known pattern """
+
+    for line in lines:
+        if not is_error_line(line):
+            continue
+        lower = line.lower()
+
+        if "undefined-variable" in lower or "undefined variable" in lower:
+            return "Undefined Variable"
+        elif "pylint" in lower or "your code has been rated at" in lower:
+            return "Lint Error"
+        elif "would reformat" in lower or "black" in lower:
+            return "Format Error"
+        elif "assert" in lower and "==" in lower:
+            return "Assertion Error"
+        elif "traceback" in lower or "exception:" in lower:
+            return "Runtime Error"
+        elif "exit code" in lower or re.search(r"exit code \d+", lower):
+            return "Subprocess Error"
+        elif "syntaxerror" in lower:
+            return "Syntax Error"
+        elif "test" in lower and ("failed" in lower or "failure" in lower):
+            return "Test Failure"
+
+    return UNKNOWN_ERROR
@@ -2,57 +2,111 @@
 import jwt
 import time
 import requests
+import threading
+from datetime import datetime
 from pathlib import Path
 
 APP_ID = "1237035"
 GITHUB_API_URL = "https://api.github.com"
 PRIVATE_KEY_PATH = Path.home() / ".ssh/github-app.pem"
+JWT_LIFETIME = 10 * 60
+TOKEN_REFRESH_MARGIN = 60   # refresh cached tokens this many seconds before they expire
+
+# One keep-alive session shared by every call so we don't open a new connection per request
+session = requests.Session()
+session.headers.update({"Accept": "application/vnd.github+json"})
+
+# Auth is cached in memory - the PEM, the app JWT, installation ids per repo and tokens per installation
+_cache_lock = threading.Lock()
+_private_keys = {}
+_app_jwt = {"token": None, "expires_at": 0}
+_installation_ids = {}      # repo_full_name -> installation id
+_installation_tokens = {}   # installation id -> (token, expires_at)
+
+def load_private_key(private_key_path):
+    if private_key_path not in _private_keys:
+        with open(private_key_path, "r") as f:
+            _private_keys[private_key_path] = f.read()
+    return _private_keys[private_key_path]
 
 def generate_jwt(app_id, private_key_path):
-    with open(private_key_path, "r") as f:
-        private_key = f.read()
+    private_key = load_private_key(private_key_path)
 
     payload = {
         "iat": int(time.time()),
-        "exp": int(time.time()) + (10 * 60),
+        "exp": int(time.time()) + JWT_LIFETIME,
         "iss": app_id
     }
 
     return jwt.encode(payload, private_key, algorithm="RS256")
 
+def get_app_jwt():
+    """ Returns the cached app JWT, signing a new one when it is close to expiring """
+    if _app_jwt["expires_at"] - time.time() < TOKEN_REFRESH_MARGIN:
+        _app_jwt["token"] = generate_jwt(APP_ID, PRIVATE_KEY_PATH)
+        _app_jwt["expires_at"] = time.time() + JWT_LIFETIME
+    return _app_jwt["token"]
+
 def get_installation_id(repo_full_name, jwt_token):
     headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json"
+        "Authorization": f"Bearer {jwt_token}"
     }
 
-    res = requests.get(f"{GITHUB_API_URL}/repos/{repo_full_name}/installation", headers=headers)
+    res = session.get(f"{GITHUB_API_URL}/repos/{repo_full_name}/installation", headers=headers)
     res.raise_for_status()
     return res.json()["id"]
 
 def get_installation_token(installation_id, jwt_token):
+    """ Mints a new installation token - returns the token and its expiry as a unix timestamp """
     headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json"
+        "Authorization": f"Bearer {jwt_token}"
     }
 
-    res = requests.post(
+    res = session.post(
         f"{GITHUB_API_URL}/app/installations/{installation_id}/access_tokens",
         headers=headers
     )
     res.raise_for_status()
-    return res.json()["token"]
+    data = res.json()
+    expires_at = datetime.fromisoformat(data["expires_at"].replace("Z", "+00:00")).timestamp()
+    return data["token"], expires_at
+
+def get_access_token(repo_full_name):
+    """ Returns a valid installation token for the repo - only talks to GitHub when nothing usable is cached """
+    with _cache_lock:
+        installation_id = _installation_ids.get(repo_full_name)
+        if installation_id is None:
+            installation_id = get_installation_id(repo_full_name, get_app_jwt())
+            _installation_ids[repo_full_name] = installation_id
+
+        cached = _installation_tokens.get(installation_id)
+        if cached and cached[1] - time.time() > TOKEN_REFRESH_MARGIN:
+            return cached[0]
+
+        token, expires_at = get_installation_token(installation_id, get_app_jwt())
+        _installation_tokens[installation_id] = (token, expires_at)
+        return token
+
+def forget_access_token(repo_full_name):
+    """ Drops the cached auth for a repo, e.g. after GitHub rejects the token or the app is reinstalled """
+    with _cache_lock:
+        installation_id = _installation_ids.pop(repo_full_name, None)
+        _installation_tokens.pop(installation_id, None)
+
+def send_authenticated(method, url, repo_full_name, body):
+    """ Sends a request using the repo's cached installation token, retrying once with fresh auth on a 401 """
+    for attempt in range(2):
+        headers = {
+            "Authorization": f"token {get_access_token(repo_full_name)}"
+        }
+        res = session.request(method, url, json=body, headers=headers)
+        if res.status_code == 401 and attempt == 0:
+            forget_access_token(repo_full_name)
+            continue
+        res.raise_for_status()
+        return res.json()
 
 def create_check(repo_full_name, commit_sha, name, status, conclusion=None, output=None):
-    jwt_token = generate_jwt(APP_ID, PRIVATE_KEY_PATH)
-    installation_id = get_installation_id(repo_full_name, jwt_token)
-    access_token = get_installation_token(installation_id, jwt_token)
-
-    headers = {
-        "Authorization": f"token {access_token}",
-        "Accept": "application/vnd.github+json"
-    }
-
     body = {
         "name": name,
         "head_sha": commit_sha,
@@ -69,20 +123,9 @@ def create_check(repo_full_name, commit_sha, name, status, conclusion=None, outp
         body["output"] = output
 
     url = f"{GITHUB_API_URL}/repos/{repo_full_name}/check-runs"
-    res = requests.post(url, json=body, headers=headers)
-    res.raise_for_status()
-    return res.json()
+    return send_authenticated("POST", url, repo_full_name, body)
 
 def update_check(repo_full_name, check_run_id, status, conclusion=None, output=None):
-    jwt_token = generate_jwt(APP_ID, PRIVATE_KEY_PATH)
-    installation_id = get_installation_id(repo_full_name, jwt_token)
-    access_token = get_installation_token(installation_id, jwt_token)
-
-    headers = {
-        "Authorization": f"token {access_token}",
-        "Accept": "application/vnd.github+json"
-    }
-
     body = {
         "status": status
     }
@@ -95,6 +138,4 @@ def update_check(repo_full_name, check_run_id, status, conclusion=None, output=N
         body["output"] = output
 
     url = f"{GITHUB_API_URL}/repos/{repo_full_name}/check-runs/{check_run_id}"
-    res = requests.patch(url, json=body, headers=headers)
-    res.raise_for_status()
-    return res.json()
\ No newline at end of file
+    return send_authenticated("PATCH", url, repo_full_name, body)
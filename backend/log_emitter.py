@@ -0,0 +1,73 @@
+""" Coalesces log lines per build and emits them to that build's Socket.IO room in batched frames """
+import threading
+import time
+from threading import Lock
+
+
+def build_room(build_id):
+    """ Name of the Socket.IO room that clients join to follow a single build """
+    return f"build:{build_id}"
+
+
+class LogEmitter:
+    """ Buffers log lines per build and emits them as one 'log-batch' frame every `interval`
+        seconds, or straight away once `max_batch` lines are waiting for a build. Lines pushed with
+        a seq go out with the seq of the frame's first line, so clients can spot gaps and repeats. """
+
+    def __init__(self, socketio, interval=0.05, max_batch=100):
+        self.socketio = socketio
+        self.interval = interval
+        self.max_batch = max_batch
+        self._buffers = {}          # build_id -> (seq of the first line or None, lines waiting to be emitted)
+        self._lock = Lock()         # guards the buffers
+        self._emit_lock = Lock()    # keeps frames for a build in order when two threads flush at once
+        self._started = False
+
+    def start(self):
+        """ Starts the background flusher thread - safe to call more than once """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def push(self, build_id, line, seq=None):
+        """ Queues a line for the build's room, flushing early if the batch is full. Lines with a
+            seq must be pushed in seq order. """
+        self.start()
+        while True:
+            with self._lock:
+                buffer = self._buffers.get(build_id)
+                # A frame is either numbered lines or un-numbered ones - never a mix
+                if buffer is None or (buffer[0] is None) == (seq is None):
+                    buffer = self._buffers.setdefault(build_id, (seq, []))
+                    buffer[1].append(line)
+                    is_full = len(buffer[1]) >= self.max_batch
+                    break
+            self.flush(build_id)
+
+        if is_full:
+            self.flush(build_id)
+
+    def flush(self, build_id):
+        """ Emits everything waiting for a build as a single frame """
+        with self._emit_lock:
+            with self._lock:
+                buffer = self._buffers.pop(build_id, None)
+            if buffer and buffer[1]:
+                first_seq, lines = buffer
+                frame = {"build_id": build_id, "logs": lines}
+                if first_seq is not None:
+                    frame["first_seq"] = first_seq
+                self.socketio.emit("log-batch", frame, to=build_room(build_id))
+
+    def flush_all(self):
+        with self._lock:
+            build_ids = list(self._buffers)
+        for build_id in build_ids:
+            self.flush(build_id)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush_all()
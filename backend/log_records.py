@@ -0,0 +1,94 @@
+""" Structured log records - a live build's lines are held as parallel columns and only turned into text
+    when they are printed, stored or shown """
+from array import array
+from collections import namedtuple
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from error_classifier import is_error_line
+
+STREAMS = ("system", "stdout")      # a message from the pipeline itself, or output of a command it ran
+LEVELS = ("info", "success", "warning", "error")
+STREAM_CODES = {stream: code for code, stream in enumerate(STREAMS)}
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+DISPLAY_TIMEZONE = ZoneInfo("Europe/London")
+TIMESTAMP_WIDTH = len("[2025-01-01 12:00:00] ")
+
+LogRecord = namedtuple("LogRecord", "ts build_id stage stream level msg")
+
+
+def infer_level(message):
+    """ Level of a message logged without one - from the markers the pipeline already writes """
+    if is_error_line(message):
+        return "error"
+    if "⚠️" in message:
+        return "warning"
+    if "✅" in message:
+        return "success"
+    return "info"
+
+
+def format_line(ts, stage, msg):
+    """ "[2025-01-01 12:00:00] [TEST] message" - the text form lines are printed and stored in """
+    timestamp = datetime.fromtimestamp(ts, timezone.utc).astimezone(DISPLAY_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] {'[{}] '.format(stage.upper()) if stage else ''}{msg}"
+
+
+def format_record(record):
+    return format_line(record.ts, record.stage, record.msg)
+
+
+def line_message(line, stage):
+    """ The message of a line format_line wrote for `stage` - its prefix length is known, so nothing is parsed """
+    return line[TIMESTAMP_WIDTH + (len(stage.upper()) + 3 if stage else 0):]
+
+
+def to_wire(ts, stage, stream, level, msg):
+    """ Compact form sent to clients - [ts, stage, stream, level, msg], the build_id travels with the frame """
+    return [round(ts, 3), stage, stream, level, msg]
+
+
+class LogColumns:
+    """ One build's records as parallel columns - timestamps in a float array, stage, stream and level as
+        small integer codes, and the messages in a list - so a line costs a message string rather than a
+        formatted copy plus a tuple. Indexing and slicing give back LogRecords, and `del columns[:n]`
+        drops the oldest lines, so it stands in for the list of lines the log store works with. """
+
+    def __init__(self, build_id):
+        self.build_id = build_id
+        self.ts = array("d")
+        self.stage = array("H")
+        self.stream = array("B")
+        self.level = array("B")
+        self.msg = []
+        self._stages = [None]               # code -> stage name, in the order first seen
+        self._stage_codes = {None: 0}
+
+    def append(self, ts, stage, stream, level, msg):
+        stage_code = self._stage_codes.get(stage)
+        if stage_code is None:
+            stage_code = self._stage_codes[stage] = len(self._stages)
+            self._stages.append(stage)
+
+        self.ts.append(ts)
+        self.stage.append(stage_code)
+        self.stream.append(STREAM_CODES[stream])
+        self.level.append(LEVEL_CODES[level])
+        self.msg.append(msg)
+
+    def __len__(self):
+        return len(self.msg)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        return self._record(range(len(self))[index])
+
+    def __delitem__(self, index):
+        for column in (self.ts, self.stage, self.stream, self.level, self.msg):
+            del column[index]
+
+    def _record(self, i):
+        return LogRecord(
+            self.ts[i], self.build_id, self._stages[self.stage[i]],
+            STREAMS[self.stream[i]], LEVELS[self.level[i]], self.msg[i]
+        )
@@ -0,0 +1,51 @@
+""" Bounded, numbered tail of each live build's log - lets reconnecting clients catch up from the last line they saw """
+from collections import deque
+from threading import Lock
+
+
+class LogRing:
+    """ Keeps the newest `capacity` lines of every live build, each numbered with its seq - the
+        line's index in the build's full log, the same numbering /executions/<id>/logs uses.
+        Older lines fall off the front; clients that fell further behind read them from storage. """
+
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self._lines = {}        # build_id -> deque of the newest lines
+        self._next_seqs = {}    # build_id -> seq the next line will get
+        self._lock = Lock()
+
+    def start(self, build_id, first_seq=0):
+        """ Begins numbering a build's lines at first_seq - e.g. after lines persisted before a restart """
+        with self._lock:
+            self._lines[build_id] = deque(maxlen=self.capacity)
+            self._next_seqs[build_id] = first_seq
+
+    def append(self, build_id, line):
+        """ Adds a line and returns its seq """
+        with self._lock:
+            if build_id not in self._lines:
+                self._lines[build_id] = deque(maxlen=self.capacity)
+                self._next_seqs[build_id] = 0
+            seq = self._next_seqs[build_id]
+            self._lines[build_id].append(line)
+            self._next_seqs[build_id] = seq + 1
+            return seq
+
+    def since(self, build_id, after_seq):
+        """ Lines after after_seq as (first_seq, lines, complete) - complete is False when some of
+            the requested lines are no longer held, or the build isn't live here at all """
+        with self._lock:
+            lines = self._lines.get(build_id)
+            if lines is None:
+                return after_seq + 1, [], False
+
+            next_seq = self._next_seqs[build_id]
+            oldest_seq = next_seq - len(lines)
+            first_seq = max(after_seq + 1, oldest_seq)
+            skip = first_seq - oldest_seq
+            return first_seq, [line for i, line in enumerate(lines) if i >= skip], first_seq == after_seq + 1
+
+    def discard(self, build_id):
+        with self._lock:
+            self._lines.pop(build_id, None)
+            self._next_seqs.pop(build_id, None)
@@ -0,0 +1,75 @@
+""" Log search index - splits finished builds' log lines into searchable rows and builds highlighted snippets """
+import re
+from models import database, LogLine
+from log_records import infer_level, line_message
+
+# "[2025-01-01 12:00:00] [TEST] message" - only parsed for lines stored before their stage and level were kept
+LINE_PATTERN = re.compile(r"^\[[^\]]*\] (?:\[([A-Z0-9_:-]+)\] )?(.*)$", re.DOTALL)
+SNIPPET_CHARS = 200
+INSERT_BATCH = 1000
+
+
+def parse_line(line):
+    """ Returns (tag or None, message) for a formatted log line """
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None, line
+    return match.group(1), match.group(2)
+
+
+def index_build_logs(build_id, lines, fields):
+    """ (Re)writes the search rows of a build from its lines and their [stage, level] fields (see
+        log_store.read_line_fields) - safe to call again, e.g. after a re-run """
+
+    database.session.query(LogLine).filter(LogLine.build_id == build_id).delete()
+
+    rows = []
+    for line_no, (line, field) in enumerate(zip(lines, fields)):
+        if field is None:
+            tag, message = parse_line(line)
+            level = infer_level(message)
+        else:
+            stage, level = field
+            tag = stage.upper() if stage else None
+            message = line_message(line, stage)
+        if not message.strip():
+            continue
+        rows.append({"build_id": build_id, "line_no": line_no, "tag": tag, "level": level, "message": message})
+        if len(rows) >= INSERT_BATCH:
+            database.session.execute(LogLine.__table__.insert(), rows)
+            rows = []
+    if rows:
+        database.session.execute(LogLine.__table__.insert(), rows)
+
+    try:
+        database.session.commit()
+    except Exception:
+        database.session.rollback()
+        raise
+
+
+def snippet(message, terms):
+    """ Cuts a message down to SNIPPET_CHARS around the first match and returns it with the
+        [start, end) offsets of every case-insensitive occurrence of the terms """
+
+    lower = message.lower()
+    positions = [lower.find(term.lower()) for term in terms if term and term.lower() in lower]
+    start = 0
+    if len(message) > SNIPPET_CHARS and positions:
+        start = max(0, min(positions) - SNIPPET_CHARS // 4)
+    text = message[start:start + SNIPPET_CHARS]
+
+    prefix = "…" if start else ""
+    suffix = "…" if start + SNIPPET_CHARS < len(message) else ""
+
+    # Offsets are into the returned text, ellipsis included
+    highlights = []
+    text_lower = text.lower()
+    for term in terms:
+        if not term:
+            continue
+        for match in re.finditer(re.escape(term.lower()), text_lower):
+            highlights.append([match.start() + len(prefix), match.end() + len(prefix)])
+    highlights.sort()
+
+    return {"text": prefix + text + suffix, "highlights": highlights}
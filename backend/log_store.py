@@ -0,0 +1,278 @@
+""" Append-only log persistence - new lines are written as numbered chunks rather than rewriting Execution.logs,
+    and once a build finishes its log is compacted into compressed segments that can be read a window at a time """
+import gzip
+import json
+from contextlib import nullcontext
+from threading import Lock
+from models import database, LogChunk, LogSegment
+from log_records import format_record
+
+SEGMENT_LINES = 2000        # lines per compressed segment of a finished build's log
+
+flushed_line_counts = {}   # build_id -> how many collected lines have already been persisted
+next_chunk_seqs = {}       # build_id -> seq number of the next chunk to write
+flush_locks = {}
+
+
+def get_flush_lock(build_id):
+    """ Retrieves or creates the lock that serialises chunk writes for a given build_id """
+
+    if build_id not in flush_locks:
+        flush_locks[build_id] = Lock()
+    return flush_locks[build_id]
+
+
+def unflushed_lines(build_id, lines):
+    """ Returns the collected records that have not been written to a chunk yet """
+    return lines[flushed_line_counts.get(build_id, 0):]
+
+
+def unflushed_count(build_id, lines):
+    """ How many collected records have not been written to a chunk yet - counted without copying them """
+    return len(lines) - flushed_line_counts.get(build_id, 0)
+
+
+def append_new_lines(build_id, lines):
+    """ Writes any collected records not yet persisted as a single new chunk of text lines - returns how
+        many lines were written """
+
+    with get_flush_lock(build_id):
+        start = flushed_line_counts.get(build_id, 0)
+        new_lines = lines[start:]
+        if not new_lines:
+            return 0
+
+        seq = next_chunk_seqs.get(build_id)
+        if seq is None:
+            # Pick up after any chunks written before a restart
+            last_seq = database.session.query(database.func.max(LogChunk.seq)).filter(LogChunk.build_id == build_id).scalar()
+            seq = 0 if last_seq is None else last_seq + 1
+
+        database.session.add(LogChunk(
+            build_id=build_id,
+            seq=seq,
+            lines="\n".join(map(format_record, new_lines)),
+            line_count=len(new_lines),
+            fields=[[record.stage, record.level] for record in new_lines]
+        ))
+        try:
+            database.session.commit()
+        except Exception:
+            database.session.rollback()
+            raise
+
+        flushed_line_counts[build_id] = start + len(new_lines)
+        next_chunk_seqs[build_id] = seq + 1
+        return len(new_lines)
+
+
+def spill_flushed_lines(build_id, lines, keep):
+    """ Drops already-persisted lines from the front of a build's in-memory list so at most `keep`
+        remain - unflushed lines are never dropped """
+
+    with get_flush_lock(build_id):
+        excess = min(flushed_line_counts.get(build_id, 0), len(lines) - keep)
+        if excess > 0:
+            del lines[:excess]
+            flushed_line_counts[build_id] -= excess
+
+
+def forget(build_id):
+    """ Releases the bookkeeping for a build whose log has been fully persisted """
+    flushed_line_counts.pop(build_id, None)
+    next_chunk_seqs.pop(build_id, None)
+    flush_locks.pop(build_id, None)
+
+
+def read_chunked_logs(build_id):
+    """ Joins the persisted chunks of a build back into one log, or None if it has no chunks """
+
+    chunks = (
+        database.session.query(LogChunk.lines)
+        .filter(LogChunk.build_id == build_id)
+        .order_by(LogChunk.seq)
+        .all()
+    )
+    if not chunks:
+        return None
+    return "\n".join(chunk.lines for chunk in chunks)
+
+
+def read_execution_logs(execution):
+    """ Reads the whole log of an execution - from segments, then chunks, then the legacy logs column """
+
+    if has_segments(execution.id):
+        return "\n".join(read_log_lines(execution, 0, None)[1])
+
+    chunked = read_chunked_logs(execution.id)
+    return chunked if chunked is not None else (execution.logs or "")
+
+
+def has_segments(build_id):
+    return database.session.query(LogSegment.seq).filter(LogSegment.build_id == build_id).first() is not None
+
+
+def compact_logs(execution):
+    """ Rewrites a finished build's chunks (or legacy logs column) as compressed segments and drops the
+        uncompressed copies - does nothing if the build is already compacted. Returns the number of lines. """
+
+    build_id = execution.id
+    # Only builds still flushing hold a lock - don't create one for an old build that is being read
+    with flush_locks.get(build_id) or nullcontext():
+        if has_segments(build_id):
+            return count_log_lines(execution)
+
+        lines = read_uncompacted_lines(execution)
+        fields = read_uncompacted_fields(execution)
+        for seq, first_line in enumerate(range(0, len(lines), SEGMENT_LINES)):
+            segment = lines[first_line:first_line + SEGMENT_LINES]
+            segment_fields = fields[first_line:first_line + SEGMENT_LINES]
+            database.session.add(LogSegment(
+                build_id=build_id,
+                seq=seq,
+                first_line=first_line,
+                line_count=len(segment),
+                data=gzip.compress("\n".join(segment).encode("utf-8")),
+                fields=gzip.compress(json.dumps(segment_fields).encode("utf-8")) if any(segment_fields) else None
+            ))
+
+        database.session.query(LogChunk).filter(LogChunk.build_id == build_id).delete()
+        execution.logs = None
+        try:
+            database.session.commit()
+        except Exception:
+            database.session.rollback()
+            raise
+
+        return len(lines)
+
+
+def count_log_lines(execution):
+    """ Number of persisted log lines of a build """
+
+    total = (
+        database.session.query(database.func.sum(LogSegment.line_count))
+        .filter(LogSegment.build_id == execution.id)
+        .scalar()
+    )
+    if total is not None:
+        return total
+
+    chunks, counted, chunk_total = (
+        database.session.query(
+            database.func.count(LogChunk.seq), database.func.count(LogChunk.line_count), database.func.sum(LogChunk.line_count)
+        )
+        .filter(LogChunk.build_id == execution.id)
+        .one()
+    )
+    if chunks and chunks == counted:
+        return chunk_total
+    return len(read_uncompacted_lines(execution))
+
+
+def read_uncompacted_lines(execution):
+    logs = read_chunked_logs(execution.id)
+    if logs is None:
+        logs = execution.logs or ""
+    return logs.split("\n") if logs else []
+
+
+def read_uncompacted_fields(execution):
+    """ [stage, level] of each line of read_uncompacted_lines - None for lines stored before they were kept """
+
+    chunks = (
+        database.session.query(LogChunk.lines, LogChunk.fields)
+        .filter(LogChunk.build_id == execution.id)
+        .order_by(LogChunk.seq)
+        .all()
+    )
+    if not chunks:
+        return [None] * len(read_uncompacted_lines(execution))
+
+    fields = []
+    for chunk in chunks:
+        fields.extend(chunk.fields if chunk.fields is not None else [None] * (chunk.lines.count("\n") + 1))
+    return fields
+
+
+def read_line_fields(execution):
+    """ [stage, level] of each line of read_execution_logs - None for lines stored before they were kept """
+
+    if not has_segments(execution.id):
+        return read_uncompacted_fields(execution)
+
+    fields = []
+    segments = (
+        database.session.query(LogSegment.line_count, LogSegment.fields)
+        .filter(LogSegment.build_id == execution.id)
+        .order_by(LogSegment.seq)
+    )
+    for segment in segments:
+        if segment.fields is None:
+            fields.extend([None] * segment.line_count)
+        else:
+            fields.extend(json.loads(gzip.decompress(segment.fields)))
+    return fields
+
+
+def read_chunk_lines(execution, offset, end):
+    """ read_log_lines for a build that isn't compacted - only the chunks overlapping the window are
+        fetched, unless some chunk predates line counts, in which case the whole log is read """
+
+    chunks = (
+        database.session.query(LogChunk.seq, LogChunk.line_count)
+        .filter(LogChunk.build_id == execution.id)
+        .order_by(LogChunk.seq)
+        .all()
+    )
+    if not chunks or any(chunk.line_count is None for chunk in chunks):
+        lines = read_uncompacted_lines(execution)
+        return len(lines), lines[offset:end]
+
+    wanted = []
+    window_start = None
+    first_line = 0
+    for chunk in chunks:
+        if first_line + chunk.line_count > offset and (end is None or first_line < end):
+            wanted.append(chunk.seq)
+            if window_start is None:
+                window_start = first_line
+        first_line += chunk.line_count
+    if not wanted:
+        return first_line, []
+
+    lines = []
+    rows = (
+        database.session.query(LogChunk.lines)
+        .filter(LogChunk.build_id == execution.id, LogChunk.seq.in_(wanted))
+        .order_by(LogChunk.seq)
+    )
+    for row in rows:
+        lines.extend(row.lines.split("\n"))
+    stop = None if end is None else end - window_start
+    return first_line, lines[offset - window_start:stop]
+
+
+def read_log_lines(execution, offset, limit):
+    """ Returns (total persisted lines, lines[offset:offset + limit]) - for a compacted build only the
+        segments overlapping the window are fetched and decompressed. A limit of None reads to the end. """
+
+    end = None if limit is None else offset + limit
+
+    if not has_segments(execution.id):
+        return read_chunk_lines(execution, offset, end)
+
+    query = LogSegment.query.filter(
+        LogSegment.build_id == execution.id,
+        LogSegment.first_line + LogSegment.line_count > offset
+    )
+    if end is not None:
+        query = query.filter(LogSegment.first_line < end)
+
+    lines = []
+    for segment in query.order_by(LogSegment.seq):
+        segment_lines = gzip.decompress(segment.data).decode("utf-8").split("\n")
+        start = max(0, offset - segment.first_line)
+        stop = None if end is None else max(0, end - segment.first_line)
+        lines.extend(segment_lines[start:stop])
+    return count_log_lines(execution), lines
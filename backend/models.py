@@ -5,6 +5,18 @@ from sqlalchemy.dialects.postgresql import JSON
 database = SQLAlchemy()
 
 class Execution(database.Model):
+    __table_args__ = (
+        # Backs keyset pagination of the execution lists (newest first)
+        database.Index("ix_execution_timestamp_id", "timestamp", "id"),
+        # Keeps range-filtered dashboard aggregates cheap as history grows
+        database.Index("ix_execution_timestamp_status", "timestamp", "status"),
+        # Partial index over the handful of builds still running or paused, for startup recovery
+        database.Index(
+            "ix_execution_active", "id",
+            postgresql_where=database.text("status = 'Pending' OR is_paused = true")
+        ),
+    )
+
     id = database.Column(database.String, primary_key=True)
     repo_title = database.Column(database.String, nullable=False)
     pr_name = database.Column(database.String, nullable=True)
@@ -17,4 +29,67 @@ class Execution(database.Model):
     pause_stage = database.Column(database.String, nullable=True)
     pause_type = database.Column(database.String, nullable=True)
     breakpoints = database.Column(JSON, default={})
-    duration = database.Column(database.Interval, nullable=True)
\ No newline at end of file
+    duration = database.Column(database.Interval, nullable=True)
+    error_category = database.Column(database.String, nullable=True, index=True)
+
+class LogChunk(database.Model):
+    """ Append-only batch of log lines for a build - chunks are read back in seq order """
+    build_id = database.Column(database.String, database.ForeignKey("execution.id"), primary_key=True)
+    seq = database.Column(database.Integer, primary_key=True)
+    lines = database.Column(database.Text, nullable=False)
+    line_count = database.Column(database.Integer, nullable=True)   # None for chunks written before it was stored
+    fields = database.Column(JSON, nullable=True)                   # [stage, level] per line - None for older chunks
+
+class LogSegment(database.Model):
+    """ gzip-compressed run of consecutive log lines of a finished build - ranged reads only inflate the segments they touch """
+    build_id = database.Column(database.String, database.ForeignKey("execution.id"), primary_key=True)
+    seq = database.Column(database.Integer, primary_key=True)
+    first_line = database.Column(database.Integer, nullable=False)
+    line_count = database.Column(database.Integer, nullable=False)
+    data = database.Column(database.LargeBinary, nullable=False)
+    fields = database.Column(database.LargeBinary, nullable=True)   # gzipped JSON [stage, level] per line, None if unknown
+
+class LogLine(database.Model):
+    """ Search index over the log lines of finished builds - one row per line, with the stage and level it was logged with """
+    __table_args__ = (
+        # Word search (to_tsvector) and substring search (trigram) over the message
+        database.Index(
+            "ix_log_line_message_tsv",
+            database.func.to_tsvector(database.literal_column("'simple'"), database.text("message")),
+            postgresql_using="gin"
+        ),
+        database.Index(
+            "ix_log_line_message_trgm", "message",
+            postgresql_using="gin", postgresql_ops={"message": "gin_trgm_ops"}
+        ),
+    )
+
+    id = database.Column(database.BigInteger, primary_key=True)
+    build_id = database.Column(database.String, database.ForeignKey("execution.id"), nullable=False, index=True)
+    line_no = database.Column(database.Integer, nullable=False)     # index in the build's full log
+    tag = database.Column(database.String, nullable=True)           # LINT, TEST, BUILD... as written by log()
+    level = database.Column(database.String, nullable=True)         # info, success, warning or error
+    message = database.Column(database.Text, nullable=False)
+
+class StageRun(database.Model):
+    """ One stage of one build - written when the stage starts and completed when it finishes """
+    __table_args__ = (
+        # Backs the per-stage duration trends
+        database.Index("ix_stage_run_stage_started_at", "stage", "started_at"),
+    )
+
+    id = database.Column(database.Integer, primary_key=True)
+    build_id = database.Column(database.String, database.ForeignKey("execution.id"), nullable=False, index=True)
+    stage = database.Column(database.String, nullable=False)
+    started_at = database.Column(database.DateTime(timezone=True), nullable=False)
+    finished_at = database.Column(database.DateTime(timezone=True), nullable=True)
+    status = database.Column(database.String, nullable=False)     # running | passed | failed | skipped | cached
+    exit_code = database.Column(database.Integer, nullable=True)
+
+class StageCache(database.Model):
+    """ A stage that passed for a repo with a given input hash - later builds with the same inputs can skip it """
+    repo_title = database.Column(database.String, primary_key=True)
+    stage = database.Column(database.String, primary_key=True)
+    input_hash = database.Column(database.String, primary_key=True)
+    build_id = database.Column(database.String, nullable=False)
+    created_at = database.Column(database.DateTime(timezone=True), nullable=False)
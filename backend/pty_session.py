@@ -0,0 +1,160 @@
+""" Persistent interactive shell in a build container, driven through a pseudo-terminal """
+import codecs
+import os
+import pty
+import select
+import subprocess
+import threading
+import time
+
+READY_MARKER = "__ci_console_ready__"
+
+
+class PtySession:
+    """ One long-lived `docker exec -it <container> bash` per build. Commands are written to the
+        shell's terminal and its output - stdout and stderr interleaved in the order the shell
+        wrote them - is read without blocking and handed to send(sid, text, ack) for the one
+        client attached to the session. Reading pauses while `max_unacked` chunks are waiting for
+        the client to ack them, so a slow browser backs up into the shell instead of into memory. """
+
+    def __init__(self, container_name, send, on_exit=None, max_unacked=8, ack_timeout=10.0, chunk_size=4096):
+        self.container_name = container_name
+        self.send = send
+        self.on_exit = on_exit
+        self.max_unacked = max_unacked
+        self.ack_timeout = ack_timeout      # stop waiting for acks from a client that never sends them
+        self.chunk_size = chunk_size
+        self.process = None
+        self._fd = None
+        self._sid = None
+        self._unacked = 0
+        self._last_ack = time.monotonic()
+        self._closed = False
+        self._ready = threading.Event()     # set once the shell has applied the console settings
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def start(self):
+        master_fd, slave_fd = pty.openpty()
+        self.process = subprocess.Popen(
+            ["docker", "exec", "-it", self.container_name, "bash", "--noediting"],
+            stdin=slave_fd,
+            stdout=slave_fd,
+            stderr=slave_fd,
+            start_new_session=True,
+            close_fds=True
+        )
+        os.close(slave_fd)
+        os.set_blocking(master_fd, False)
+        self._fd = master_fd
+
+        # No echo or prompt - the console draws its own. The shell reports its cwd after every
+        # command as a terminal title escape, which the caller can turn into a prompt.
+        self._write(
+            "stty -echo; PS1=''; PROMPT_COMMAND='printf \"\\033]0;%s\\007\" \"$PWD\"'; "
+            "printf '__ci_console_%s__\\n' ready\n"    # prints READY_MARKER, which the echoed line doesn't contain
+        )
+        threading.Thread(target=self._pump, name=f"pty-{self.container_name}", daemon=True).start()
+
+    def attach(self, sid):
+        """ Sends output to this client from now on - only one client drives a session at a time """
+        with self._condition:
+            if sid != self._sid:
+                self._sid = sid
+                self._unacked = 0
+            self._condition.notify()
+
+    def detach(self, sid):
+        with self._condition:
+            if self._sid == sid:
+                self._sid = None
+                self._unacked = 0
+
+    def write(self, text):
+        """ Types text into the shell - waits for the console settings first, so the shell never echoes it back """
+        self._ready.wait(timeout=5.0)
+        self._write(text)
+
+    def _write(self, text):
+        data = text.encode("utf-8")
+        with self._write_lock:
+            while data:
+                _, writable, _ = select.select([], [self._fd], [], 1.0)
+                if writable:
+                    data = data[os.write(self._fd, data):]
+
+    def is_alive(self):
+        return not self._closed and self.process is not None and self.process.poll() is None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+    def _acknowledge(self, *args):
+        with self._condition:
+            self._unacked = max(0, self._unacked - 1)
+            self._last_ack = time.monotonic()
+            self._condition.notify()
+
+    def _wait_for_client(self):
+        """ Blocks while nobody is attached or the attached client is too far behind - returns its sid """
+        with self._condition:
+            while not self._closed:
+                if self._sid is not None:
+                    if self._unacked < self.max_unacked:
+                        return self._sid
+                    if time.monotonic() - self._last_ack > self.ack_timeout:
+                        self._unacked = 0
+                        return self._sid
+                self._condition.wait(timeout=0.5)
+            return None
+
+    def _pump(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        ready = False
+        pending = ""
+
+        try:
+            while True:
+                sid = self._wait_for_client()
+                if sid is None:
+                    break
+
+                readable, _, _ = select.select([self._fd], [], [], 0.1)
+                if not readable:
+                    if self.process.poll() is not None:
+                        break
+                    continue
+
+                try:
+                    data = os.read(self._fd, self.chunk_size)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    break       # EIO - the shell has exited and the terminal is gone
+                if not data:
+                    break
+
+                text = decoder.decode(data).replace("\r\n", "\n")
+                if not ready:
+                    # Drop the setup line echoed before `stty -echo` took effect
+                    pending += text
+                    if READY_MARKER + "\n" not in pending:
+                        continue
+                    ready = True
+                    self._ready.set()
+                    text = pending.split(READY_MARKER + "\n", 1)[1]
+
+                if text:
+                    with self._condition:
+                        self._unacked += 1
+                    self.send(sid, text, self._acknowledge)
+        finally:
+            with self._condition:
+                self._closed = True
+            os.close(self._fd)
+            if self.on_exit:
+                self.on_exit()
@@ -0,0 +1,49 @@
+""" Stage result cache - a stage can be skipped when its inputs match those of a passing build """
+import fnmatch
+import hashlib
+import os
+import subprocess
+
+# Files each cacheable stage reads - None means every tracked file (the Dockerfile and requirements included)
+STAGE_INPUTS = {
+    "lint": ("*.py", ".pylintrc"),
+    "format": ("*.py", "pyproject.toml"),
+    "test": None,
+}
+
+# Documentation never changes a stage's outcome, so editing it doesn't invalidate the cache
+DOCUMENTATION_FILES = ("*.md", "*.rst")
+
+
+def tracked_blob_hashes(local_repo_path):
+    """ path -> git blob hash for every tracked file in the checkout - git already has the
+        content hashes, so nothing needs to be read from disk """
+    output = subprocess.run(
+        ["git", "-C", local_repo_path, "ls-files", "-s"],
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+
+    blobs = {}
+    for line in output.splitlines():
+        # <mode> <blob hash> <stage>\t<path>
+        meta, _, path = line.partition("\t")
+        blobs[path] = meta.split()[1]
+    return blobs
+
+
+def stage_input_hash(stage, blobs):
+    """ Hash of the files `stage` reads, or None if the stage can't be cached """
+    if stage not in STAGE_INPUTS:
+        return None
+
+    patterns = STAGE_INPUTS[stage]
+    digest = hashlib.sha256(stage.encode("utf-8"))
+    for path in sorted(blobs):
+        name = os.path.basename(path)
+        if any(fnmatch.fnmatch(name, pattern) for pattern in DOCUMENTATION_FILES):
+            continue
+        if patterns is None or any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            digest.update(f"{path}\0{blobs[path]}\n".encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,95 @@
+""" DAG stage scheduler - runs pipeline stages as soon as every stage they need has passed """
+import threading
+import time
+
+SUCCEEDED = ("passed", "cached")    # statuses that let the stages depending on a stage go ahead
+
+
+def topological_order(needs):
+    """ Orders the stages so each comes after everything it needs, keeping the declared order where it
+        can - raises ValueError for a dependency on an unknown stage or a cycle """
+
+    for name, required in needs.items():
+        for dependency in required:
+            if dependency not in needs:
+                raise ValueError(f"Stage '{name}' needs unknown stage '{dependency}'")
+
+    order = []
+    state = {}      # name -> "visiting" | "done"
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+
+        state[name] = "visiting"
+        for dependency in needs[name]:
+            visit(dependency, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in needs:
+        visit(name, [])
+    return order
+
+
+def run_stage_graph(needs, run_stage, max_workers=2, on_skip=None):
+    """ Runs run_stage(name) for every stage in `needs` (name -> list of stage names it needs), with at
+        most `max_workers` stages running at once. A stage whose dependencies failed or were skipped is
+        skipped too, while independent branches carry on. run_stage may return a status of its own
+        (e.g. "cached") for a stage that succeeded without running. Returns name -> result in dependency
+        order, where each result holds status ("passed" | "failed" | "skipped" | ...), started_at,
+        duration and error. """
+
+    order = topological_order(needs)
+    max_workers = max(1, max_workers)
+    results = {
+        name: {"status": "pending", "started_at": None, "duration": None, "error": None}
+        for name in order
+    }
+    condition = threading.Condition()
+    running = 0
+
+    def worker(name):
+        nonlocal running
+        started = time.monotonic()
+        error = None
+        status = None
+        try:
+            status = run_stage(name)
+        except Exception as e:
+            error = e
+
+        with condition:
+            results[name]["status"] = "failed" if error else (status or "passed")
+            results[name]["duration"] = time.monotonic() - started
+            results[name]["error"] = error
+            running -= 1
+            condition.notify()
+
+    with condition:
+        while True:
+            # Dependencies always come earlier in `order`, so one pass carries skips all the way down
+            for name in order:
+                result = results[name]
+                if result["status"] == "pending" and any(results[d]["status"] in ("failed", "skipped") for d in needs[name]):
+                    result["status"] = "skipped"
+                    if on_skip:
+                        on_skip(name)
+
+            for name in order:
+                if running >= max_workers:
+                    break
+                result = results[name]
+                if result["status"] == "pending" and all(results[d]["status"] in SUCCEEDED for d in needs[name]):
+                    result["status"] = "running"
+                    result["started_at"] = time.time()
+                    running += 1
+                    threading.Thread(target=worker, args=(name,), name=f"stage-{name}", daemon=True).start()
+
+            if not running:
+                break
+            condition.wait()
+
+    return results
@@ -0,0 +1,32 @@
+""" Splits a project's test files into shards that take roughly the same time to run """
+import os
+
+
+def discover_test_files(local_repo_path, tests_dir="tests"):
+    """ Test files pytest would collect from the tests directory, as paths relative to the repo root """
+    test_files = []
+    for root, dirs, files in os.walk(os.path.join(local_repo_path, tests_dir)):
+        dirs[:] = sorted(d for d in dirs if not d.startswith((".", "__pycache__")))
+        for name in sorted(files):
+            if name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py")):
+                test_files.append(os.path.relpath(os.path.join(root, name), local_repo_path))
+    return test_files
+
+
+def split_into_shards(test_files, shard_count, weights):
+    """ Longest-first greedy split - each file goes to the shard with the least work so far.
+        `weights` maps a file to its expected cost; returns only the shards that got files """
+    shards = [[] for _ in range(max(1, shard_count))]
+    loads = [0] * len(shards)
+
+    for test_file in sorted(test_files, key=lambda f: weights.get(f, 0), reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(test_file)
+        loads[lightest] += weights.get(test_file, 0)
+
+    return [sorted(shard) for shard in shards if shard]
+
+
+def file_size_weights(local_repo_path, test_files):
+    """ Uses file size as a stand-in for how long a test file takes to run """
+    return {f: os.path.getsize(os.path.join(local_repo_path, f)) for f in test_files}
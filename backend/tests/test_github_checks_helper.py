@@ -0,0 +1,102 @@
+""" Check run updates against a local stub of the GitHub API - once auth is cached, each update is one request """
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import github_checks_helper as ghChecks
+
+FIXTURES = Path(__file__).parent / "fixtures"
+REPO = "octo/project"
+INSTALLATION_ID = 42
+CHECK_RUN_ID = 7
+
+
+class StubGitHub(BaseHTTPRequestHandler):
+    """ Answers the four endpoints the helper uses and records every request it gets """
+    protocol_version = "HTTP/1.1"      # keep-alive, so reused connections show up as one client port
+    token_lifetime = 3600
+
+    def do_GET(self):
+        self.respond({"id": INSTALLATION_ID})
+
+    def do_POST(self):
+        if self.path.endswith("/access_tokens"):
+            expires_at = datetime.fromtimestamp(time.time() + self.token_lifetime, timezone.utc)
+            self.respond({"token": "installation-token", "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")})
+        else:
+            self.respond({"id": CHECK_RUN_ID})
+
+    def do_PATCH(self):
+        self.respond({"id": CHECK_RUN_ID})
+
+    def respond(self, payload):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self.server.requests.append((self.command, self.path, self.client_address[1]))
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGitHub)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(ghChecks, "GITHUB_API_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(ghChecks, "PRIVATE_KEY_PATH", FIXTURES / "github-app-test.pem")
+    monkeypatch.setattr(ghChecks, "session", ghChecks.requests.Session())
+    monkeypatch.setattr(ghChecks, "_private_keys", {})
+    monkeypatch.setattr(ghChecks, "_app_jwt", {"token": None, "expires_at": 0})
+    monkeypatch.setattr(ghChecks, "_installation_ids", {})
+    monkeypatch.setattr(ghChecks, "_installation_tokens", {})
+
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_first_call_authenticates_then_each_update_is_one_request(github):
+    ghChecks.create_check(REPO, "abc123", "CI Pipeline", "in_progress")
+    assert [(method, path) for method, path, _ in github.requests] == [
+        ("GET", f"/repos/{REPO}/installation"),
+        ("POST", f"/app/installations/{INSTALLATION_ID}/access_tokens"),
+        ("POST", f"/repos/{REPO}/check-runs"),
+    ]
+
+    for status in ("in_progress", "in_progress", "completed"):
+        before = len(github.requests)
+        ghChecks.update_check(REPO, CHECK_RUN_ID, status, conclusion="success")
+        assert [(method, path) for method, path, _ in github.requests[before:]] == [
+            ("PATCH", f"/repos/{REPO}/check-runs/{CHECK_RUN_ID}"),
+        ]
+
+    # Every request went over the same kept-alive connection
+    assert len({port for _, _, port in github.requests}) == 1
+
+
+def test_token_close_to_expiry_is_minted_again(github, monkeypatch):
+    monkeypatch.setattr(StubGitHub, "token_lifetime", ghChecks.TOKEN_REFRESH_MARGIN // 2)
+    ghChecks.update_check(REPO, CHECK_RUN_ID, "in_progress")
+
+    before = len(github.requests)
+    ghChecks.update_check(REPO, CHECK_RUN_ID, "in_progress")
+
+    # The installation id stays cached - only the token is minted again
+    assert [(method, path) for method, path, _ in github.requests[before:]] == [
+        ("POST", f"/app/installations/{INSTALLATION_ID}/access_tokens"),
+        ("PATCH", f"/repos/{REPO}/check-runs/{CHECK_RUN_ID}"),
+    ]
@@ -1,3 +1,7 @@
-from app import socketio, app
+from app import socketio, app, start_background_services
 
-application = app
\ No newline at end of file
+# Re-queue builds a previous server process left running or paused and start the docker garbage
+# collector - once per startup, not per connection
+start_background_services()
+
+application = app
@@ -0,0 +1,55 @@
+import React from "react";
+import styles from "./StageTrendsCard.module.css";
+
+// Seconds -> "42s" / "3m 5s"
+const formatSeconds = (seconds) => {
+  if (seconds < 60) return `${Math.round(seconds)}s`;
+  return `${Math.floor(seconds / 60)}m ${Math.round(seconds % 60)}s`;
+};
+
+const StageTrendsCard = ({ stages }) => {
+  const entries = Object.entries(stages || {});
+  // Bars share one scale across stages so slow stages stand out
+  const maxP95 = Math.max(1, ...entries.flatMap(([, s]) => s.trend.map((t) => t.p95)));
+
+  return (
+    <div className={styles.stageTrends}>
+      <h2>Stage Durations</h2>
+      <table>
+        <thead>
+          <tr>
+            <th>Stage</th>
+            <th>p50</th>
+            <th>p95</th>
+            <th>Runs</th>
+            <th>p95 Trend</th>
+          </tr>
+        </thead>
+        <tbody>
+          {entries.map(([stage, s]) => (
+            <tr key={stage}>
+              <td>{stage}</td>
+              <td>{formatSeconds(s.p50)}</td>
+              <td>{formatSeconds(s.p95)}</td>
+              <td>{s.runs}</td>
+              <td>
+                <div className={styles.trend}>
+                  {s.trend.map((t) => (
+                    <div
+                      key={t.period}
+                      className={styles.bar}
+                      style={{ height: `${(t.p95 / maxP95) * 100}%` }}
+                      title={`${new Date(t.period).toLocaleString()} - p50 ${formatSeconds(t.p50)}, p95 ${formatSeconds(t.p95)} (${t.runs} runs)`}
+                    />
+                  ))}
+                </div>
+              </td>
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  );
+};
+
+export default StageTrendsCard;
@@ -29,8 +29,10 @@ const DebugConsole = ({ buildId, repoTitle, isPaused }) => {
   }, [repoTitle, buildId, isPaused]);
 
   useEffect(() => {
-    socket.on("console-output", (data) => {
+    socket.on("console-output", (data, ack) => {
       setHistory((prev) => [...prev, data.output]);
+      // Acknowledge each chunk - the server stops reading the shell while too many are unacknowledged
+      if (ack) ack();
     });
 
     socket.on("prompt-update", (data) => {
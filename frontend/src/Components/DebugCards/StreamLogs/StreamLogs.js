@@ -9,7 +9,27 @@ const getLogClass = (line) => {
   return styles.default;
 };
 
-const StreamLogs = ({ logs = [] }) => {
+const LEVEL_CLASSES = {
+  error: styles.error,
+  warning: styles.warning,
+  success: styles.success,
+};
+
+// "2025-01-01 12:00:00" in the server's timezone, matching the stored lines
+const timestampFormat = new Intl.DateTimeFormat("sv-SE", {
+  timeZone: "Europe/London",
+  dateStyle: "short",
+  timeStyle: "medium",
+});
+
+// Live lines arrive as [ts, stage, stream, level, msg] records - stored lines are already text
+const formatLine = (line) => {
+  if (typeof line === "string") return line;
+  const [ts, stage, , , msg] = line;
+  return `[${timestampFormat.format(ts * 1000)}] ${stage ? `[${stage.toUpperCase()}] ` : ""}${msg}`;
+};
+
+const StreamLogs = ({ logs = [], hasEarlier = false, onLoadEarlier }) => {
   const bottomRef = useRef(null);
 
   useEffect(() => {
@@ -21,13 +41,20 @@ const StreamLogs = ({ logs = [] }) => {
     <div className={styles.container}>
       <h3 className={styles.title}>Stream logs</h3>
       <div className={styles.logContent}>
-        {logs.map((line, i) => {
-          const isErrorLine = line.includes("❌") 
+        {hasEarlier && (
+          <button className={styles.loadEarlier} onClick={onLoadEarlier}>
+            Load earlier lines
+          </button>
+        )}
+        {logs.map((entry, i) => {
+          const line = formatLine(entry);
+          const level = typeof entry === "string" ? null : entry[3];
+          const isErrorLine = level ? level === "error" : line.includes("❌");
 
           if (isErrorLine) inErrorBlock = true;
           const isEndOfBlock = line.trim() === "" || (/^\[.*\]/.test(line) && !isErrorLine);
           if (inErrorBlock && isEndOfBlock) inErrorBlock = false;
-          const lineClass = inErrorBlock ? styles.error : getLogClass(line);
+          const lineClass = inErrorBlock ? styles.error : LEVEL_CLASSES[level] || getLogClass(line);
 
           return (
             <div key={i} className={`${styles.logLine} ${lineClass}`}>
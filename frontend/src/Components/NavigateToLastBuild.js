@@ -15,10 +15,10 @@ const NavigateToLastOrFirstBuild = ({ target = "debug" }) => {
       }
 
       try {
-        const res = await fetch("http://35.177.242.182:5000/executions");
+        const res = await fetch("http://35.177.242.182:5000/executions?limit=1");
         const data = await res.json();
-        if (data.length > 0) {
-          navigate(`/${target}/${data[0].id}`);
+        if (data.items.length > 0) {
+          navigate(`/${target}/${data.items[0].id}`);
         } else {
           navigate("/dashboard");
         }
@@ -7,6 +7,9 @@ format: true
 build: true
 test: true
 
+# Run lint and format at the same time
+parallel_checks: false
+
 # Optional breakpoint controls
 pause_before_clone: false
 pause_after_clone: false
@@ -6,11 +6,27 @@ import SemiCircularProgressBar from "../Components/DashboardCards/ProgressBar/Se
 import NumericCard from "../Components/DashboardCards/NumericCard/NumericCard";
 import BuildCard from "../Components/DashboardCards/BuildCard/BuildCard";
 import PipelineTable from "../Components/DashboardCards/tableCard/pipelineTable";
+import StageTrendsCard from "../Components/DashboardCards/StageTrendsCard/StageTrendsCard";
+
+const API_URL = "http://35.177.242.182:5000";
+
+const buildPageUrl = (path, range, cursor) => {
+  const url = new URL(`${API_URL}/${path}`);
+  if (range) url.searchParams.append("range", range);
+  if (cursor) url.searchParams.append("cursor", cursor);
+  return url;
+};
+
+// True once a scrollable element is within a few rows of its end - used to lazily load the next page
+const isNearBottom = (el) => el.scrollTop + el.clientHeight >= el.scrollHeight - 40;
 
 const Dashboard = () => {
   const [RepoName,  setRepoName] = useState("Repo Name");
   const [builds, setBuilds] = useState([]);
+  const [buildsCursor, setBuildsCursor] = useState(null);
   const [pipelineTableData, setPipelineTableData] = useState([]);
+  const [stagesCursor, setStagesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [metrics, setMetrics] = useState({
     avg_build_time: 0,
     failure_rate: 0,
@@ -19,6 +35,7 @@ const Dashboard = () => {
     releases: 0,
   });
   const [errorChart, setErrorChart] = useState(null);
+  const [stageTrends, setStageTrends] = useState({});
   const [selectedRange, setSelectedRange] = useState(null);
 
   const options = [
@@ -34,15 +51,9 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchAllDashboardData = async () => {
       try {
-        const buildUrl = new URL("http://35.177.242.182:5000/executions");
-        const metricsUrl = new URL("http://35.177.242.182:5000/dashboard-metrics");
-        const stagesUrl = new URL("http://35.177.242.182:5000/executions-with-stages");
-  
-        if (selectedRange) {
-          buildUrl.searchParams.append("range", selectedRange);
-          metricsUrl.searchParams.append("range", selectedRange);
-          stagesUrl.searchParams.append("range", selectedRange);
-        }
+        const buildUrl = buildPageUrl("executions", selectedRange);
+        const metricsUrl = buildPageUrl("dashboard-metrics", selectedRange);
+        const stagesUrl = buildPageUrl("executions-with-stages", selectedRange);
   
         const [buildsRes, metricsRes, stagesRes] = await Promise.all([
           fetch(buildUrl),
@@ -54,13 +65,15 @@ const Dashboard = () => {
         const metricsData = await metricsRes.json();
         const stagesData = await stagesRes.json();
   
-        setBuilds(buildsData);
-        if (buildsData.length > 0) {
-          setRepoName(buildsData[0].repo_title);
+        setBuilds(buildsData.items);
+        setBuildsCursor(buildsData.next_cursor);
+        if (buildsData.items.length > 0) {
+          setRepoName(buildsData.items[0].repo_title);
         }
   
         setMetrics(metricsData);
-        setPipelineTableData(stagesData);
+        setPipelineTableData(stagesData.items);
+        setStagesCursor(stagesData.next_cursor);
       } catch (err) {
         console.error("❌ Failed to fetch dashboard data:", err);
       }
@@ -85,21 +98,46 @@ const Dashboard = () => {
   }, [selectedRange]);
 
   useEffect(() => {
-    const fetchPipelineTableData = async () => {
+    const fetchStageTrends = async () => {
       try {
-        const url = new URL("http://35.177.242.182:5000/executions-with-stages");
-        if (selectedRange) url.searchParams.append("range", selectedRange);
-        const res = await fetch(url);
+        const res = await fetch(buildPageUrl("stage-duration-trends", selectedRange));
         const data = await res.json();
-        setPipelineTableData(data);
+        setStageTrends(data.stages);
       } catch (err) {
-        console.error("❌ Failed to fetch pipeline table data:", err);
+        console.error("❌ Failed to fetch stage duration trends:", err);
       }
     };
-  
-    fetchPipelineTableData();
+    fetchStageTrends();
   }, [selectedRange]);
 
+  // Fetches the next page of a paginated list once the user scrolls near the end of it
+  const loadMore = async (path, cursor, setItems, setCursor) => {
+    if (!cursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(buildPageUrl(path, selectedRange, cursor));
+      const data = await res.json();
+      setItems((prev) => [...prev, ...data.items]);
+      setCursor(data.next_cursor);
+    } catch (err) {
+      console.error(`❌ Failed to fetch more ${path}:`, err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleBuildListScroll = (e) => {
+    if (isNearBottom(e.currentTarget)) {
+      loadMore("executions", buildsCursor, setBuilds, setBuildsCursor);
+    }
+  };
+
+  const handlePipelineTableScroll = (e) => {
+    if (isNearBottom(e.currentTarget)) {
+      loadMore("executions-with-stages", stagesCursor, setPipelineTableData, setStagesCursor);
+    }
+  };
+
   return (
     <div className={styles.page}>
       <div className={styles.headerSection}>
@@ -113,7 +151,7 @@ const Dashboard = () => {
       </div>
 
       <div className={styles.section}>
-        <div className={styles.listContainer}>
+        <div className={styles.listContainer} onScroll={handleBuildListScroll}>
           {builds.map((build) => (
             <BuildCard
               key={build.id}
@@ -184,7 +222,7 @@ const Dashboard = () => {
       </div>
 
       <div className={styles.section2}>
-        <div className={styles.pipelineContainer}>
+        <div className={styles.pipelineContainer} onScroll={handlePipelineTableScroll}>
           <PipelineTable builds={pipelineTableData} />
         </div>
 
@@ -193,6 +231,10 @@ const Dashboard = () => {
         </div>
       </div>
 
+      <div className={styles.section3}>
+        <StageTrendsCard stages={stageTrends} />
+      </div>
+
     </div>
   );
 };
@@ -1,5 +1,5 @@
 import { useNavigate, useParams } from "react-router-dom";
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import styles from "../styles/DebugPage.module.css";
 import BuildListCard from "../Components/DebugCards/BuildListCard/BuildListCard";
 import BreakpointTracker from "../Components/DebugCards/BreakpointTracker/BreakpointTracker";
@@ -11,6 +11,8 @@ const socket = io("http://35.177.242.182:5000");
 
 const stageOrder = ["setup", "build", "test"];
 
+const LOG_WINDOW = 1000;   // log lines fetched per request
+
 const initialBreakpointStates = {
   setup: { before: false, after: false },
   build: { before: false, after: false },
@@ -21,6 +23,8 @@ const DebugPage = () => {
   const { buildId } = useParams();
   const navigate = useNavigate();
   const [buildData, setBuildData] = useState([]);
+  const [buildCursor, setBuildCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [repoTitle, setRepoTitle] = useState("");
   const [selectedBuild, setSelectedBuild] = useState(null);
   const [isPaused, setIsPaused] = useState(false);
@@ -33,14 +37,20 @@ const DebugPage = () => {
     step: "Cloning main repo",
   });
   const [logs, setLogs] = useState([]);
+  const [logOffset, setLogOffset] = useState(0);   // index of the first log line loaded so far
+  // seq (index in the full log) of the newest line shown - live frames and replays are merged against it
+  const lastSeqRef = useRef(-1);
+  const initialLoadRef = useRef(true);
+  const catchingUpRef = useRef(false);
 
-  // Fetch list of builds
+  // Fetch the first page of builds - later pages load as the list is scrolled
   useEffect(() => {
     const fetchBuildList = async () => {
       try {
         const res = await fetch("http://35.177.242.182:5000/executions");
         const data = await res.json();
-        setBuildData(data);
+        setBuildData(data.items);
+        setBuildCursor(data.next_cursor);
       } catch (err) {
         console.error("❌ Failed to fetch build list:", err);
       }
@@ -48,21 +58,56 @@ const DebugPage = () => {
     fetchBuildList();
   }, []);
 
-  // Sync selected build with the URL param
+  const handleBuildListScroll = async (e) => {
+    const el = e.currentTarget;
+    if (!buildCursor || loadingMore || el.scrollTop + el.clientHeight < el.scrollHeight - 40) return;
+
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`http://35.177.242.182:5000/executions?cursor=${encodeURIComponent(buildCursor)}`);
+      const data = await res.json();
+      setBuildData((prev) => [...prev, ...data.items]);
+      setBuildCursor(data.next_cursor);
+    } catch (err) {
+      console.error("❌ Failed to fetch more builds:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Sync selected build with the URL param - older builds may not be in the loaded pages yet,
+  // in which case the execution fetch below fills it in
   useEffect(() => {
     const match = buildData.find((b) => b.id === buildId);
-    setSelectedBuild(match || null);
+    if (match) setSelectedBuild(match);
   }, [buildId, buildData]);
 
   // Fetch individual build logs & title
   useEffect(() => {
     const fetchExecutionData = async () => {
       try {
-        const res = await fetch(`http://35.177.242.182:5000/executions/${buildId}`);
+        // Only the tail of the log is loaded up front - earlier lines are fetched on demand
+        const [res, logsRes] = await Promise.all([
+          fetch(`http://35.177.242.182:5000/executions/${buildId}`),
+          fetch(`http://35.177.242.182:5000/executions/${buildId}/logs?tail=${LOG_WINDOW}`),
+        ]);
         const data = await res.json();
+        const logsData = await logsRes.json();
 
-        if (data?.logs) setLogs(data.logs.split("\n"));
+        if (logsData?.lines) {
+          setLogs(logsData.lines);
+          setLogOffset(logsData.offset);
+          lastSeqRef.current = logsData.offset + logsData.lines.length - 1;
+        }
+        // Anything logged since the tail was read is replayed from the server's live buffer
+        initialLoadRef.current = false;
+        socket.emit("join-build", { build_id: buildId, after_seq: lastSeqRef.current });
         if (data?.repo_title) setRepoTitle(data.repo_title);
+        if (data?.id) {
+          setSelectedBuild((prev) =>
+            prev?.id === data.id ? prev : { id: data.id, status: data.status, pr_name: data.pr_name }
+          );
+        }
         if (data?.active_stage) setActiveStage({ stage: data.active_stage, step: "" });
         if (data?.is_paused) {
           setIsPaused(true);
@@ -97,11 +142,76 @@ const DebugPage = () => {
     }
   }, [buildId]);
 
+  const loadEarlierLogs = async () => {
+    if (logOffset === 0) return;
+    const start = Math.max(0, logOffset - LOG_WINDOW);
+    try {
+      const res = await fetch(
+        `http://35.177.242.182:5000/executions/${buildId}/logs?offset=${start}&limit=${logOffset - start}`
+      );
+      const data = await res.json();
+      setLogs((prev) => [...data.lines, ...prev]);
+      setLogOffset(start);
+    } catch (err) {
+      console.error("❌ Failed to fetch earlier logs:", err);
+    }
+  };
+
   useEffect(() => {
-    socket.on("log", (data) => {
-      if (data.build_id === buildId) {
-        setLogs((prevLogs) => [...prevLogs, data.log]);
+    lastSeqRef.current = -1;
+    initialLoadRef.current = true;
+
+    // Appends numbered lines, dropping any already shown - returns false if lines are missing before them
+    const appendNumbered = (firstSeq, lines) => {
+      if (firstSeq > lastSeqRef.current + 1) return false;
+      const fresh = lines.slice(lastSeqRef.current + 1 - firstSeq);
+      if (fresh.length) {
+        lastSeqRef.current += fresh.length;
+        setLogs((prevLogs) => [...prevLogs, ...fresh]);
       }
+      return true;
+    };
+
+    // Fills a gap from storage (read-only), then asks for a replay of anything newer
+    const catchUp = async () => {
+      if (catchingUpRef.current) return;
+      catchingUpRef.current = true;
+      try {
+        const res = await fetch(
+          `http://35.177.242.182:5000/executions/${buildId}/logs?offset=${lastSeqRef.current + 1}&limit=10000`
+        );
+        const data = await res.json();
+        appendNumbered(data.offset, data.lines);
+        // Nothing new in storage means there is nothing left to replay (e.g. the build has finished)
+        if (data.lines.length) socket.emit("join-build", { build_id: buildId, after_seq: lastSeqRef.current });
+      } catch (err) {
+        console.error("❌ Failed to catch up on logs:", err);
+      } finally {
+        catchingUpRef.current = false;
+      }
+    };
+
+    // Only follow this build's log room - rejoin whenever the socket reconnects, resuming after the
+    // last line shown. Before the first load that's nothing, as the tail fetch covers it.
+    const joinBuildRoom = () =>
+      socket.emit("join-build", initialLoadRef.current
+        ? { build_id: buildId }
+        : { build_id: buildId, after_seq: lastSeqRef.current });
+    joinBuildRoom();
+    socket.on("connect", joinBuildRoom);
+
+    socket.on("log-batch", (data) => {
+      if (data.build_id !== buildId) return;
+      if (data.first_seq === undefined) {
+        setLogs((prevLogs) => [...prevLogs, ...data.logs]);
+      } else if (!initialLoadRef.current && !appendNumbered(data.first_seq, data.logs)) {
+        catchUp();
+      }
+    });
+
+    socket.on("log-replay", (data) => {
+      if (data.build_id !== buildId) return;
+      if (!appendNumbered(data.first_seq, data.logs) || !data.complete) catchUp();
     });
 
     socket.on("build-started", (data) => {
@@ -109,8 +219,8 @@ const DebugPage = () => {
       setRepoTitle(data.repo_title);
     });
 
-    socket.on("pause-configured", ({ breakpoints }) => {
-      setBreakpoints(breakpoints);
+    socket.on("pause-configured", ({ breakpoints, build_id }) => {
+      if (build_id === buildId) setBreakpoints(breakpoints);
     });
 
     socket.on("debug-session-started", () => {
@@ -130,7 +240,10 @@ const DebugPage = () => {
     });
 
     return () => {
-      socket.off("log");
+      socket.emit("leave-build", { build_id: buildId });
+      socket.off("connect", joinBuildRoom);
+      socket.off("log-batch");
+      socket.off("log-replay");
       socket.off("build-started");
       socket.off("pause-configured");
       socket.off("debug-session-started");
@@ -188,7 +301,7 @@ const DebugPage = () => {
 
   return (
     <div className={styles.page}>
-      <div className={styles.listContainer}>
+      <div className={styles.listContainer} onScroll={handleBuildListScroll}>
         {buildData.map((build) => (
           <BuildListCard
             key={build.id}
@@ -230,7 +343,7 @@ const DebugPage = () => {
             isPaused={isPaused}
           />
 
-          <StreamLogs logs={logs} />
+          <StreamLogs logs={logs} hasEarlier={logOffset > 0} onLoadEarlier={loadEarlierLogs} />
           <DebugConsole buildId={buildId} repoTitle={repoTitle} isPaused={isPaused} />
         </div>
       ) : (
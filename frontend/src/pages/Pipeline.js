@@ -96,7 +96,7 @@ const PipelinePage = () => {
       const res = await fetch(`http://35.177.242.182:5000/pipeline-config/${repo}`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ content: yamlText }),
+        body: JSON.stringify({ content: yamlText, branch }),
       });
       const data = await res.json();
       if (data?.status === "success") {